@@ -1,28 +1,32 @@
-
+import sys
 import pandas as pd
 import numpy as np
 
-# 读取数据
-df = pd.read_csv('queue_log_40_R_random_W_random_646444.csv', names=['Time', 'Workstation', 'QueueLength'])
+from tracer import read_queue_trace
 
-# 计算仿真总时间
-T = df['Time'].max()
+# 读取数据（trace 文件由 TRACE_PATH / headless.py --trace 生成，'.npz' 只读取队列列）
+trace_path = sys.argv[1] if len(sys.argv) > 1 else 'queue_log.csv'
+series, metadata = read_queue_trace(trace_path)
 
-# 这里必须是仿真中实际到达系统的总任务数 (需要你实际仿真数据来确认)
-total_jobs_arrived = 255  # 请根据你的仿真实际任务数修改这个数字！
+# 注意：仿真中 Workstation.get_lq()/get_wq() 已在线给出同样的结果，此脚本仅用于离线分析 trace
 
-# 到达率 lambda (jobs per second)
-arrival_rate = total_jobs_arrived / T
+# 计算仿真总时间
+T = metadata.get('sim_time', max(time_values[-1] for time_values, _ in series.values()))
 
 results = []
 
-for ws in sorted(df['Workstation'].unique()):
-    ws_df = df[df['Workstation'] == ws].sort_values(by='Time')
-    time_values = ws_df['Time'].values
-    queue_lengths = ws_df['QueueLength'].values
+for ws, (time_values, queue_lengths) in sorted(series.items()):
+    # 每个工作站实际到达的任务数：trace 元数据中的精确计数，否则用队列长度的增量估计（同一时刻的入队和出队会相互抵消，结果偏低）
+    if 'workstation_input_job' in metadata:
+        total_jobs_arrived = metadata['workstation_input_job'][ws]
+    else:
+        total_jobs_arrived = np.sum(np.clip(np.diff(queue_lengths), 0, None))
+
+    # 到达率 lambda (jobs per second)
+    arrival_rate = total_jobs_arrived / T
 
-    # 梯形积分计算LQ
-    LQ = np.trapz(queue_lengths, time_values) / T
+    # 队列长度是阶梯函数（trace 只在变化时/按周期采样），按左端点积分计算LQ
+    LQ = np.sum(queue_lengths * np.diff(time_values, append=T)) / T
 
     # 正确使用Little's Law计算WQ
     WQ = LQ / arrival_rate if arrival_rate > 0 else np.nan
@@ -0,0 +1,38 @@
+from global_def import *
+
+
+class ArrivalCursor:
+    """
+    Cursor over sorted arrival times, hands out every arrival exactly once
+    -> pop_due(now): indices of the arrivals due up to now, amortized O(1) per arrival
+    -> used by Factory.generate_job, the event engine (peek_time) and system/hub.py
+    """
+
+    def __init__(self, arrival_times, tolerance=EPS):
+        self.arrival_times = arrival_times  # sorted
+        self.tolerance = tolerance
+        self.position = 0  # index of the next arrival not handed out yet
+
+    def __len__(self):
+        # arrivals not handed out yet
+        return len(self.arrival_times) - self.position
+
+    def peek_time(self):
+        '''
+        :return: time of the next arrival, None if all arrivals have been handed out
+        '''
+        if self.position < len(self.arrival_times):
+            return self.arrival_times[self.position]
+        return None
+
+    def pop_due(self, now):
+        '''
+        :return: range of the indices of the arrivals with time <= now (+ tolerance)
+        '''
+        start = self.position
+        end = start
+        num_arrivals = len(self.arrival_times)
+        while end < num_arrivals and self.arrival_times[end] <= now + self.tolerance:
+            end += 1
+        self.position = end
+        return range(start, end)
@@ -0,0 +1,438 @@
+'''
+Vectorized batch backend: K independent factories stepped in lockstep with NumPy
+-> same tick semantics as Factory.update(BACKEND_CYCLE_TIME), for the FIFO workstation / DEFAULT robot policies
+-> the factories share one Scenario but may differ in seed, machines per workstation and number of robots
+-> ticks where no factory has an event are skipped, the time integrals are exact over the skipped span
+-> usage: python batch.py --seeds 200 --until 36000
+'''
+import argparse
+from dataclasses import dataclass
+
+from global_def import *
+from job import *
+from device import seconds_to_hhmmss
+from replication import estimate
+
+BATCH_ROBOT_POLICIES = ['DEFAULT']
+BATCH_WORKSTATION_POLICIES = ['FIFO']
+
+
+@dataclass
+class BatchResult:
+    seeds: list
+    sim_time: float  # simulated time, unit: second
+    wall_time: float  # real time spent, unit: second
+    total_input_job: np.ndarray  # [K]
+    total_output_job: np.ndarray  # [K]
+    throughput: np.ndarray  # [K], finished jobs per hour
+    mean_job_time: np.ndarray  # [K], unit: second, nan if no job finished
+    robot_utilization: np.ndarray  # [K, robots], nan for robots a factory does not have
+    machine_utilization: np.ndarray  # [K, workstations, machines], nan for missing machines
+    workstation_utilization: np.ndarray  # [K, workstations]
+    workstation_lq: np.ndarray  # [K, workstations]
+    workstation_wq: np.ndarray
+    workstation_l: np.ndarray
+    workstation_w: np.ndarray
+    factory_lq: np.ndarray  # [K], entry queue
+    factory_wq: np.ndarray
+    factory_l: np.ndarray  # [K], jobs in the factory
+    factory_w: np.ndarray
+
+
+class BatchFactory:
+    """
+    K factories as arrays (node 0: factory entry, node i: workstation i, as in Layout)
+    -> jobs: [K, jobs] arrival / start / end time, routing index, waiting node; service times [K, jobs, steps]
+    -> machines: [K, workstations, machines] current job and finish time (remaining = finish - now)
+    -> robots: [K, robots] state, job, node, trip target and arrival time
+    -> queues: FIFO ring buffer per workstation [K, workstations, jobs], ready job pool per factory [K, jobs]
+    """
+
+    # robot state
+    ROBOT_IDLE = 0
+    ROBOT_TO_PICKUP = 1
+    ROBOT_TO_DELIVER = 2
+
+    def __init__(self, seeds, scenario=DEFAULT_SCENARIO, num_machines=None, num_robots=None, max_job_num=None,
+                 job_arrival_rate=None):
+        '''
+        :param seeds: job generation seed of every factory, K = len(seeds)
+        :param scenario: Scenario shared by the factories (layout, job types, tick length)
+        :param num_machines: machines per workstation, [workstations] or [K, workstations], None for the scenario's
+        :param num_robots: robots, int or [K], None for the scenario's
+        '''
+        self.seeds = list(seeds)
+        self.scenario = scenario
+        self.num_factories = num_factories = len(self.seeds)
+        self.num_workstations = num_workstations = scenario.num_workstations
+        self.dt = scenario.backend_cycle_time
+        self.layout = layout = scenario.layout
+        self.travel_time = layout.travel_time  # [nodes, nodes], unit: second
+        self.rng = np.random.default_rng(self.seeds)  # random robot choices of all factories
+
+        if num_machines is None:
+            num_machines = scenario.num_machines_workstation
+        if num_robots is None:
+            num_robots = scenario.num_robots
+        if max_job_num is None:
+            max_job_num = scenario.max_job_num
+        self.num_machines = np.broadcast_to(np.asarray(num_machines), (num_factories, num_workstations)).copy()
+        self.num_robots = np.broadcast_to(np.asarray(num_robots), (num_factories,)).copy()
+        max_machines = int(self.num_machines.max())
+        max_robots = int(self.num_robots.max())
+
+        # routing: next node per (job type, routing index), back to the entry after the last step
+        max_routing_len = max(len(routing) for routing in scenario.job_routing)
+        self.route_nodes = np.zeros((scenario.num_job_types, max_routing_len + 1), dtype=int)
+        for i_type, routing in enumerate(scenario.job_routing):
+            self.route_nodes[i_type, :len(routing)] = routing
+
+        # jobs, sampled exactly as generate_all_jobs does for a single factory
+        self.num_jobs = num_jobs = max_job_num
+        self.arrival_times = np.zeros((num_factories, num_jobs))
+        self.types = np.zeros((num_factories, num_jobs), dtype=int)
+        self.service_times = np.zeros((num_factories, num_jobs, max_routing_len))
+        for i_factory, seed in enumerate(self.seeds):
+            _, job_store = generate_all_jobs(max_job_num, job_arrival_rate, seed, scenario)
+            routing_lens = np.diff(job_store.service_offsets)
+            rows = np.repeat(np.arange(num_jobs), routing_lens)
+            cols = np.arange(job_store.service_offsets[-1]) - np.repeat(job_store.service_offsets[:-1], routing_lens)
+            self.arrival_times[i_factory] = job_store.arrival_times
+            self.types[i_factory] = job_store.types
+            self.service_times[i_factory, rows, cols] = job_store.service_times
+        self.factory_index = np.arange(num_factories)
+
+        self.next_arrival = np.zeros(num_factories, dtype=int)  # arrival cursor per factory
+        self.routing_indices = np.zeros((num_factories, num_jobs), dtype=int)
+        self.job_nodes = np.zeros((num_factories, num_jobs), dtype=int)  # node a ready job waits at
+        self.start_times = np.full((num_factories, num_jobs), np.nan)
+        self.end_times = np.full((num_factories, num_jobs), np.nan)
+
+        # jobs waiting for a robot (any node), swap-remove pool per factory
+        self.ready_jobs = np.zeros((num_factories, num_jobs), dtype=int)
+        self.ready_count = np.zeros(num_factories, dtype=int)
+
+        # workstation input queues, FIFO ring buffers
+        self.queue_jobs = np.zeros((num_factories, num_workstations, num_jobs), dtype=int)
+        self.queue_head = np.zeros((num_factories, num_workstations), dtype=int)
+        self.queue_tail = np.zeros((num_factories, num_workstations), dtype=int)
+
+        # machines
+        self.machine_valid = np.arange(max_machines) < self.num_machines[..., np.newaxis]
+        self.num_idle_machines = self.num_machines.copy()  # [K, workstations]
+        self.machine_jobs = np.full((num_factories, num_workstations, max_machines), -1)
+        self.machine_finish_times = np.full((num_factories, num_workstations, max_machines), np.inf)
+
+        # robots
+        self.robot_valid = np.arange(max_robots) < self.num_robots[:, np.newaxis]
+        self.robot_states = np.zeros((num_factories, max_robots), dtype=int)
+        self.robot_jobs = np.full((num_factories, max_robots), -1)
+        self.robot_nodes = np.zeros((num_factories, max_robots), dtype=int)  # node of the last stop
+        self.robot_targets = np.zeros((num_factories, max_robots), dtype=int)
+        self.robot_depart_times = np.zeros((num_factories, max_robots))
+        self.robot_arrival_times = np.full((num_factories, max_robots), np.inf)
+
+        # counts and time integrals (statistics)
+        self.total_run_time = 0.0
+        self.entry_queue_len = np.zeros(num_factories, dtype=int)
+        self.num_in_factory = np.zeros(num_factories, dtype=int)
+        self.num_in_workstation = np.zeros((num_factories, num_workstations), dtype=int)
+        self.total_input_job = np.zeros(num_factories, dtype=int)
+        self.total_output_job = np.zeros(num_factories, dtype=int)
+        self.workstation_input_job = np.zeros((num_factories, num_workstations), dtype=int)
+
+        self.entry_queue_area = np.zeros(num_factories)
+        self.factory_system_area = np.zeros(num_factories)
+        self.workstation_queue_area = np.zeros((num_factories, num_workstations))
+        self.workstation_system_area = np.zeros((num_factories, num_workstations))
+        self.machine_busy_time = np.zeros((num_factories, num_workstations, max_machines))
+        self.robot_busy_time = np.zeros((num_factories, max_robots))
+
+    @property
+    def queue_lengths(self):
+        # [K, nodes]: entry queue and workstation input queues
+        return np.concatenate([self.entry_queue_len[:, np.newaxis], self.queue_tail - self.queue_head], axis=1)
+
+    def get_machine_remaining_times(self):
+        # [K, workstations, machines], inf for idle machines
+        return self.machine_finish_times - self.total_run_time
+
+    def get_robot_positions(self):
+        # [K, robots, 2], moving robots interpolated along their trip
+        positions = self.layout.positions
+        origin = positions[self.robot_nodes]
+        target = positions[self.robot_targets]
+        moving = self.robot_states != self.ROBOT_IDLE
+        duration = np.where(moving, self.robot_arrival_times - self.robot_depart_times, 1.0)
+        progress = np.clip((self.total_run_time - self.robot_depart_times) / np.maximum(duration, EPS), 0.0, 1.0)
+        progress = np.where(moving, progress, 0.0)[..., np.newaxis]
+        return origin + (target - origin) * progress
+
+    def append_ready(self, factories, jobs):
+        # add jobs to the ready pools, several jobs of the same factory allowed
+        order = np.argsort(factories, kind='stable')
+        factories, jobs = factories[order], jobs[order]
+        rank = np.arange(len(factories)) - np.searchsorted(factories, factories, side='left')
+        self.ready_jobs[factories, self.ready_count[factories] + rank] = jobs
+        np.add.at(self.ready_count, factories, 1)
+
+    def get_next_nodes(self, factories, jobs):
+        return self.route_nodes[self.types[factories, jobs], self.routing_indices[factories, jobs]]
+
+    def integrate(self, elapsed):
+        # time integrals over (now - elapsed, now] with the counts of the last tick
+        self.entry_queue_area += self.entry_queue_len * elapsed
+        self.factory_system_area += self.num_in_factory * elapsed
+        self.workstation_queue_area += (self.queue_tail - self.queue_head) * elapsed
+        self.workstation_system_area += self.num_in_workstation * elapsed
+        self.machine_busy_time += (self.machine_jobs >= 0) * elapsed
+        self.robot_busy_time += (self.robot_states != self.ROBOT_IDLE) * elapsed
+
+    def release_jobs(self, now):
+        # Factory.generate_job + Factory.add_job
+        while True:
+            has_next = self.next_arrival < self.num_jobs
+            next_index = np.minimum(self.next_arrival, self.num_jobs - 1)
+            due = has_next & (self.arrival_times[self.factory_index, next_index] <= now + EPS)
+            if not due.any():
+                return
+            factories = np.flatnonzero(due)
+            jobs = self.next_arrival[factories]
+            self.next_arrival[factories] += 1
+            self.start_times[factories, jobs] = now
+            self.job_nodes[factories, jobs] = 0
+            self.append_ready(factories, jobs)
+            self.entry_queue_len[factories] += 1
+            self.num_in_factory[factories] += 1
+            self.total_input_job[factories] += 1
+
+    def dispatch_machines(self, now):
+        # FIFO workstation policy: queue head -> idle machine with the lowest index
+        while True:
+            factories, workstations = np.nonzero((self.num_idle_machines > 0) & (self.queue_tail > self.queue_head))
+            if len(factories) == 0:
+                return
+            idle = self.machine_valid[factories, workstations] & (self.machine_jobs[factories, workstations] < 0)
+            machines = np.argmax(idle, axis=-1)
+            self.num_idle_machines[factories, workstations] -= 1
+            jobs = self.queue_jobs[factories, workstations, self.queue_head[factories, workstations] % self.num_jobs]
+            self.queue_head[factories, workstations] += 1
+
+            # as in Workstation.assign_job, the machine starts at the beginning of the tick
+            service_time = self.service_times[factories, jobs, self.routing_indices[factories, jobs]]
+            self.machine_jobs[factories, workstations, machines] = jobs
+            self.machine_finish_times[factories, workstations, machines] = now - self.dt + service_time
+            self.machine_busy_time[factories, workstations, machines] += self.dt
+
+    def finish_machines(self, now):
+        # Machine.drop_job: the job waits at the workstation output for a robot
+        factories, workstations, machines = np.nonzero(self.machine_finish_times <= now + EPS)
+        if len(factories) == 0:
+            return
+        jobs = self.machine_jobs[factories, workstations, machines]
+        self.machine_jobs[factories, workstations, machines] = -1
+        self.machine_finish_times[factories, workstations, machines] = np.inf
+        np.add.at(self.num_idle_machines, (factories, workstations), 1)
+        self.routing_indices[factories, jobs] += 1
+        self.job_nodes[factories, jobs] = workstations + 1
+        self.append_ready(factories, jobs)
+        np.subtract.at(self.num_in_workstation, (factories, workstations), 1)
+
+    def move_robots(self, now):
+        # Robot.update: pick up at the station / deliver to the next station, all robots at once
+        arrived = (self.robot_states != self.ROBOT_IDLE) & (self.robot_arrival_times <= now + EPS)
+        if not arrived.any():
+            return
+        pick_up = arrived & (self.robot_states == self.ROBOT_TO_PICKUP)
+        deliver = arrived & (self.robot_states == self.ROBOT_TO_DELIVER)
+
+        factories, robots = np.nonzero(pick_up)
+        if len(factories) > 0:
+            jobs = self.robot_jobs[factories, robots]
+            nodes = self.job_nodes[factories, jobs]
+            np.subtract.at(self.entry_queue_len, factories[nodes == 0], 1)
+            next_nodes = self.get_next_nodes(factories, jobs)
+            self.robot_states[factories, robots] = self.ROBOT_TO_DELIVER
+            self.robot_nodes[factories, robots] = nodes
+            self.robot_targets[factories, robots] = next_nodes
+            self.robot_depart_times[factories, robots] = now
+            self.robot_arrival_times[factories, robots] = now + self.travel_time[nodes, next_nodes]
+
+        factories, robots = np.nonzero(deliver)  # per factory in robot index order, as Factory.update
+        if len(factories) > 0:
+            jobs = self.robot_jobs[factories, robots]
+            nodes = self.robot_targets[factories, robots]
+            self.robot_states[factories, robots] = self.ROBOT_IDLE
+            self.robot_jobs[factories, robots] = -1
+            self.robot_nodes[factories, robots] = nodes
+            self.robot_arrival_times[factories, robots] = np.inf
+
+            # back at the entry: the job is finished
+            finished = nodes == 0
+            self.end_times[factories[finished], jobs[finished]] = now
+            np.subtract.at(self.num_in_factory, factories[finished], 1)
+            np.add.at(self.total_output_job, factories[finished], 1)
+
+            # workstation: join the input queue, several robots may deliver to the same queue
+            factories, jobs, workstations = factories[~finished], jobs[~finished], nodes[~finished] - 1
+            queues = factories * self.num_workstations + workstations
+            order = np.argsort(queues, kind='stable')
+            factories, jobs, workstations, queues = factories[order], jobs[order], workstations[order], queues[order]
+            rank = np.arange(len(queues)) - np.searchsorted(queues, queues, side='left')
+            positions = (self.queue_tail[factories, workstations] + rank) % self.num_jobs
+            self.queue_jobs[factories, workstations, positions] = jobs
+            np.add.at(self.queue_tail, (factories, workstations), 1)
+            np.add.at(self.num_in_workstation, (factories, workstations), 1)
+            np.add.at(self.workstation_input_job, (factories, workstations), 1)
+
+    def assign_robots(self, now):
+        # DEFAULT robot policy: every idle robot takes a random ready job (robots in index order)
+        factories, robots = np.nonzero(self.robot_valid & (self.robot_states == self.ROBOT_IDLE) &
+                                       (self.ready_count > 0)[:, np.newaxis])
+        if len(factories) == 0:
+            return
+        rank = np.arange(len(factories)) - np.searchsorted(factories, factories, side='left')
+        served = rank < self.ready_count[factories]
+        factories, robots, rank = factories[served], robots[served], rank[served]
+
+        # round i: the i-th idle robot of every factory draws from what is left of the pool
+        for i_round in range(rank.max() + 1):
+            this_round = rank == i_round
+            round_factories, round_robots = factories[this_round], robots[this_round]
+            picks = (self.rng.random(len(round_factories)) * self.ready_count[round_factories]).astype(int)
+            jobs = self.ready_jobs[round_factories, picks]
+            self.ready_jobs[round_factories, picks] = \
+                self.ready_jobs[round_factories, self.ready_count[round_factories] - 1]
+            self.ready_count[round_factories] -= 1
+
+            nodes = self.job_nodes[round_factories, jobs]
+            origins = self.robot_nodes[round_factories, round_robots]
+            self.robot_states[round_factories, round_robots] = self.ROBOT_TO_PICKUP
+            self.robot_jobs[round_factories, round_robots] = jobs
+            self.robot_targets[round_factories, round_robots] = nodes
+            self.robot_depart_times[round_factories, round_robots] = now
+            self.robot_arrival_times[round_factories, round_robots] = now + self.travel_time[origins, nodes]
+
+    def update(self, now):
+        # one tick at time now of all factories, same order as Factory.update
+        self.integrate(now - self.total_run_time)
+        self.total_run_time = now
+        self.release_jobs(now)
+        self.dispatch_machines(now)
+        self.finish_machines(now)
+        self.move_robots(now)
+        self.assign_robots(now)
+
+    def get_next_tick(self, tick):
+        '''
+        :return: the next tick at which any factory has something to do
+        '''
+        if ((self.num_idle_machines > 0) & (self.queue_tail > self.queue_head)).any():
+            return tick + 1  # jobs delivered this tick are dispatched on the next one
+
+        has_next = self.next_arrival < self.num_jobs
+        next_index = np.minimum(self.next_arrival, self.num_jobs - 1)
+        next_arrival_time = np.where(has_next, self.arrival_times[self.factory_index, next_index], np.inf)
+        event_time = min(next_arrival_time.min(), self.machine_finish_times.min(), self.robot_arrival_times.min())
+        if not np.isfinite(event_time):
+            return None
+        return max(tick + 1, int(np.ceil((event_time - EPS) / self.dt)))
+
+    def run(self, until=None):
+        if until is None:
+            until = self.scenario.total_backend_run_time
+        last_tick = int(np.ceil(until / self.dt))
+        tick = 0
+        while tick < last_tick:
+            next_tick = self.get_next_tick(tick)
+            tick = last_tick if next_tick is None else min(next_tick, last_tick)
+            self.update(tick * self.dt)
+        return self
+
+    def get_result(self, wall_time=0.0):
+        sim_time = self.total_run_time
+        finished = ~np.isnan(self.end_times)
+        job_times = np.where(finished, self.end_times - self.start_times, 0.0)
+        num_finished = finished.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_job_time = np.where(num_finished > 0, job_times.sum(axis=1) / num_finished, np.nan)
+            total_input = np.maximum(self.total_input_job, 1)
+            workstation_input = np.maximum(self.workstation_input_job, 1)
+            return BatchResult(
+                seeds=self.seeds,
+                sim_time=sim_time,
+                wall_time=wall_time,
+                total_input_job=self.total_input_job.copy(),
+                total_output_job=self.total_output_job.copy(),
+                throughput=self.total_output_job / sim_time * 3600,
+                mean_job_time=mean_job_time,
+                robot_utilization=np.where(self.robot_valid, self.robot_busy_time / sim_time, np.nan),
+                machine_utilization=np.where(self.machine_valid, self.machine_busy_time / sim_time, np.nan),
+                workstation_utilization=self.machine_busy_time.sum(axis=-1) / self.num_machines / sim_time,
+                workstation_lq=self.workstation_queue_area / sim_time,
+                workstation_wq=self.workstation_queue_area / workstation_input,
+                workstation_l=self.workstation_system_area / sim_time,
+                workstation_w=self.workstation_system_area / workstation_input,
+                factory_lq=self.entry_queue_area / sim_time,
+                factory_wq=self.entry_queue_area / total_input,
+                factory_l=self.factory_system_area / sim_time,
+                factory_w=self.factory_system_area / total_input,
+            )
+
+
+def run_batch(seeds, until=None, scenario=DEFAULT_SCENARIO, num_machines=None, num_robots=None, max_job_num=None,
+              job_arrival_rate=None, robot_policy='DEFAULT', workstation_policy='FIFO'):
+    '''
+    Run len(seeds) factories in lockstep
+    :return: BatchResult
+    '''
+    if robot_policy not in BATCH_ROBOT_POLICIES:
+        raise ValueError(f'POLICY_NAME {robot_policy} not supported by the batch backend')
+    if workstation_policy not in BATCH_WORKSTATION_POLICIES:
+        raise ValueError(f'POLICY_NAME {workstation_policy} not supported by the batch backend')
+
+    start_time = time.perf_counter()
+    batch = BatchFactory(seeds, scenario, num_machines=num_machines, num_robots=num_robots,
+                         max_job_num=max_job_num, job_arrival_rate=job_arrival_rate)
+    batch.run(until)
+    return batch.get_result(time.perf_counter() - start_time)
+
+
+def print_batch_result(result):
+    num_factories = len(result.seeds)
+    print(f'{num_factories} factories x {seconds_to_hhmmss(result.sim_time)} in {result.wall_time:.2f} s '
+          f'({num_factories / result.wall_time:.1f} replications/s, mean ± 95% CI)')
+    print(f'  Throughput: {estimate(result.throughput)} /h')
+    print(f'  Mean job time: {estimate(result.mean_job_time[~np.isnan(result.mean_job_time)])} s')
+    print(f'  Robot util: {estimate(np.nanmean(result.robot_utilization, axis=1))}')
+    print(f'  Machine util: {estimate(np.nanmean(result.machine_utilization, axis=(1, 2)))}')
+    print(f'  Entry LQ: {estimate(result.factory_lq)}, WQ: {estimate(result.factory_wq)} s')
+    print(f'  Factory L: {estimate(result.factory_l)}, W: {estimate(result.factory_w)} s')
+    for i_ws in range(result.workstation_lq.shape[1]):
+        print(f'  W{i_ws + 1} LQ: {estimate(result.workstation_lq[:, i_ws])}, '
+              f'WQ: {estimate(result.workstation_wq[:, i_ws])} s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run K factories in lockstep with NumPy (FIFO / DEFAULT policies).')
+    parser.add_argument('--seeds', type=int, default=100, help='number of factories (replications)')
+    parser.add_argument('--base-seed', type=int, default=JOB_GENERATE_SEED)
+    parser.add_argument('--scenario', default=None, help='scenario file (.json / .toml / .yaml)')
+    parser.add_argument('--until', type=float, default=None, help='simulated time, unit: second')
+    parser.add_argument('--machines', type=int, nargs='+', default=None, help='machines per workstation')
+    parser.add_argument('--robots', type=int, default=None)
+    parser.add_argument('--max-jobs', type=int, default=None)
+    parser.add_argument('--arrival-rate', type=float, default=None, help='jobs per second')
+    args = parser.parse_args(argv)
+
+    seeds = [args.base_seed + i_seed for i_seed in range(args.seeds)]
+    result = run_batch(seeds, until=args.until,
+                       scenario=load_scenario(args.scenario) if args.scenario else DEFAULT_SCENARIO,
+                       num_machines=args.machines, num_robots=args.robots,
+                       max_job_num=args.max_jobs, job_arrival_rate=args.arrival_rate)
+    print_batch_result(result)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,15 @@
 from global_def import *
 from job import *
-
-
-# Temp functions:
-def calculate_distance(pos_start, pos_end):
-    """Calculate Euclidean distance between two points (x1, y1) and (x2, y2)."""
-    return (pos_end[0] - pos_start[0],
-            pos_end[1] - pos_start[1],
-            ((pos_end[0] - pos_start[0]) ** 2 + (pos_end[1] - pos_start[1]) ** 2) ** 0.5)
+from engine import *
+from tracer import *
+from estimator import *
+from job_queue import *
+from dispatch import *
+from arrivals import *
+from policy import *
+from render import *
+from snapshot import *
+import heapq
 
 
 class DeviceState(enum.Enum):
@@ -16,12 +18,17 @@ class DeviceState(enum.Enum):
 
 
 class Device:
-    def __init__(self, parent=None, index=0, name='', pos=FACTORY_POS):
+    def __init__(self, parent=None, index=0, name='', pos=FACTORY_POS, scenario=None):
         self.parent = parent  # parent node
         self.index = index  # index
         self.name = name  # device name
         self.pos = pos  # position in real-word unit
 
+        # configuration, inherited from the parent device (the factory holds the Scenario)
+        if scenario is None:
+            scenario = parent.scenario if parent is not None else DEFAULT_SCENARIO
+        self.scenario = scenario
+
         # current state
         self.state = DeviceState.Idle
         self.is_loaded = False  # if the device is loaded with job/item
@@ -33,37 +40,100 @@ class Device:
         self.total_busy_time = EPS
         self.time_utilization = EPS  # total_busy_time / total_run_time
 
-        # input queue
-        self.input_queue = []
-        self.input_queue_len = 0
-        self.input_job_count = [0 for i_tmp in range(NUM_JOB_TYPES)]  # count of all input jobs
+        # input queue (len derived from the queue)
+        self.input_queue = JobFifoQueue()
+        self.input_job_count = [0 for i_tmp in range(scenario.num_job_types)]  # count of all input jobs
         self.total_input_job = 0
 
-        # output queue
-        self.output_queue = []
-        self.output_queue_len = 0
-        self.output_job_count = [0 for i_tmp in range(NUM_JOB_TYPES)]  # count of all output jobs
+        # output queue (len derived from the queue)
+        self.output_queue = JobFifoQueue()
+        self.output_job_count = [0 for i_tmp in range(scenario.num_job_types)]  # count of all output jobs
         self.total_output_job = 0
 
-    def update_time(self):  # update the device timing
-        self.total_run_time += BACKEND_CYCLE_TIME
+        # queueing statistics, updated only when the counts change
+        self.queue_len_stat = TimeAverage()  # time integral of input_queue_len
+        self.num_in_system = 0  # jobs queueing or in process at this device
+        self.system_len_stat = TimeAverage()  # time integral of num_in_system
+
+    def update_time(self, dt=BACKEND_CYCLE_TIME):  # update the device timing
+        self.total_run_time += dt
 
         if self.state == DeviceState.Busy:
-            self.curr_busy_time += BACKEND_CYCLE_TIME
-            self.total_busy_time += BACKEND_CYCLE_TIME
+            self.curr_busy_time += dt
+            self.total_busy_time += dt
         else:
-            self.total_idle_time += BACKEND_CYCLE_TIME
+            self.total_idle_time += dt
 
         self.time_utilization = self.total_busy_time / self.total_run_time if self.total_run_time else 0.0
 
+    @property
+    def input_queue_len(self):
+        return len(self.input_queue)
+
+    @property
+    def output_queue_len(self):
+        return len(self.output_queue)
+
+    def record_input_queue_len(self):
+        # call after every change of the input queue
+        self.queue_len_stat.update(self.total_run_time, len(self.input_queue))
+
+    def change_num_in_system(self, delta):
+        self.num_in_system += delta
+        self.system_len_stat.update(self.total_run_time, self.num_in_system)
+
+    def get_lq(self):
+        # time-average input queue length
+        return self.queue_len_stat.mean(self.total_run_time)
+
+    def get_wq(self):
+        # average waiting time per input job (Little's Law: WQ = LQ / lambda)
+        area = self.queue_len_stat.get_area(self.total_run_time)
+        return area / self.total_input_job if self.total_input_job else 0.0
+
+    def get_l(self):
+        # time-average number of jobs queueing or in process
+        return self.system_len_stat.mean(self.total_run_time)
+
+    def get_w(self):
+        # average time per input job spent queueing or in process (W = L / lambda)
+        area = self.system_len_stat.get_area(self.total_run_time)
+        return area / self.total_input_job if self.total_input_job else 0.0
+
+    def get_root(self):
+        # the top-level device (the Factory)
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        return root
+
+    def get_trace(self):
+        return getattr(self.get_root(), 'trace', None)
+
+    def schedule_event(self, delay, event_type):
+        '''
+        通知事件引擎：delay 秒后本设备有状态变化（无引擎时忽略）
+        :param delay: time from now, unit: second
+        :param event_type: EventType
+        '''
+        engine = getattr(self.get_root(), 'event_engine', None)
+        if engine is not None:
+            engine.schedule(self.total_run_time + delay, event_type, self)
+
+    def is_idle(self):
+        return self.state == DeviceState.Idle
+
     def add_job(self, job):
         pass
 
     def drop_job(self, job):
         pass
 
-    def draw(self, screen):  # draw the device on GUI
-        pass
+    def snapshot(self):  # immutable copy of the state shown on GUI (see snapshot.py)
+        return None
+
+    def draw(self, screen):  # draw the device on GUI, always from a snapshot
+        self.snapshot().draw(screen)
 
 
 class Machine(Device):
@@ -73,12 +143,17 @@ class Machine(Device):
         self.curr_job = None
         self.curr_job_time = 0
 
-    def update(self):
-        self.update_time()
+    def sync_time(self, now):
+        # idle machines are not updated every tick: bring the clock forward to now
+        if now > self.total_run_time:
+            self.update_time(now - self.total_run_time)
+
+    def update(self, dt=BACKEND_CYCLE_TIME):
+        self.update_time(dt)
 
         # current job is finished
         if (self.state == DeviceState.Busy and
-                self.curr_busy_time >= self.curr_job_time):
+                self.curr_busy_time >= self.curr_job_time - EPS):
             self.drop_job(self.curr_job)
 
     def add_job(self, job):
@@ -100,11 +175,18 @@ class Machine(Device):
         self.state = DeviceState.Busy
         self.curr_busy_time = 0
         self.is_loaded = True
+        self.parent.set_machine_busy(self)
 
         # record
         self.input_job_count[self.curr_job.type] += 1
         self.total_input_job += 1
 
+        self.schedule_event(self.curr_job_time, EventType.MachineFinish)
+
+        trace = self.get_trace()
+        if trace is not None:
+            trace.record_machine(self.total_run_time, self.parent.index, self.index, True)
+
         return RTN_OK
 
     def drop_job(self, job):
@@ -113,6 +195,7 @@ class Machine(Device):
 
         job.state = JobState.Ready  # <--------------- Edit Job
         job.next_routing()  # <--------------- Edit Job
+        job.parent.add_ready_job(job, self.parent.node)
 
         self.curr_job = None
         self.curr_job_time = 0
@@ -120,23 +203,31 @@ class Machine(Device):
         self.state = DeviceState.Idle
         self.curr_busy_time = 0
         self.is_loaded = False
+        self.parent.set_machine_idle(self)
 
         # add to parent pool/queue
         self.parent.output_queue.append(job)
-        self.parent.output_queue_len += 1
+        self.parent.change_num_in_system(-1)
 
         # record
         self.output_job_count[job.type] += 1
         self.total_output_job += 1
 
+        # the machine is free again: let the workstation hand out the next job at once
+        self.schedule_event(0, EventType.Settle)
+
+        trace = self.get_trace()
+        if trace is not None:
+            trace.record_machine(self.total_run_time, self.parent.index, self.index, False)
+
         return RTN_OK
 
-    def get_show_text(self):
+    def snapshot(self):
         if self.state == DeviceState.Busy:
             percentage_complete = int((self.curr_busy_time / self.curr_job_time) * 100)
-            return f'**{self.name}** : [{self.curr_job.name}] | {percentage_complete:2d}%', COLOR_GREEN
+            return MachineSnapshot(self.name, True, self.curr_job.name, percentage_complete)
         else:
-            return f'**{self.name}** : Idle', COLOR_YELLOW
+            return MachineSnapshot(self.name, False)
 
 
 class Workstation(Device):
@@ -148,170 +239,92 @@ class Workstation(Device):
     def __init__(self, parent=None, index=0, name='', pos=(0, 0)):
         super().__init__(parent, index, name, pos)
 
-        self.num_machines = NUM_MACHINES_WORKSTATION[self.index]
+        self.node = self.index + 1  # station node, 0 is the factory entry
+
+        self.num_machines = self.scenario.num_machines_workstation[self.index]
         self.machines = [Machine(parent=self,
                                  index=i_machine,
                                  name=f'M{i_machine + 1}',
                                  pos=self.pos)
                          for i_machine in range(self.num_machines)]
 
-        self.workstation_policy = WORKSTATION_POLICY_NAME
-        self.q_table = {}
-
-    def get_current_state(self):
-        """获取当前队列状态"""
-        return (
-            len(self.input_queue),  # 队列长度
-            tuple(bottle.remaining_steps for bottle in self.input_queue),  # 每个瓶子的剩余步骤
-            tuple(bottle.service_time_list[bottle.curr_routing_index] for bottle in self.input_queue)  # 当前步骤的处理时间
-        )
-
-    def get_possible_actions(self):
-        """生成所有可能的动作"""
-        actions = []
-        for i in range(len(self.input_queue)):
-            for j in range(i + 1, len(self.input_queue)):
-                actions.append((i, j))  # 交换队列中第 i 和第 j 个瓶子
-        return actions
-
-    def adjust_queue(self, action):
-        """根据动作调整队列"""
-        i, j = action
-        self.input_queue[i], self.input_queue[j] = self.input_queue[j], self.input_queue[i]
-
-    def compute_reward(self, current_queue, new_queue):
-        """计算队列调整后的奖励"""
-        current_waiting_time = sum(bottle.total_process_time for bottle in current_queue)
-        new_waiting_time = sum(bottle.total_process_time for bottle in new_queue)
-        return current_waiting_time - new_waiting_time  # 奖励为等待时间减少量
-
-    def update_q_table(self, state, action, reward, next_state):
-        """更新 Q 表"""
-        best_next_action = max(
-            self.get_possible_actions(),
-            key=lambda a: self.q_table.get((next_state, a), 0.0),
-            default=None
-        )
-        # 更新 Q 值
-        self.q_table[(state, action)] += ALPHA * (
-                reward + GAMMA * self.q_table.get((next_state, best_next_action), 0.0) - self.q_table.get(
-            (state, action), 0.0)
-        )
-
-        # 调试信息：打印更新的 Q 值
-        print(f"Updated Q[{state}, {action}] = {self.q_table[(state, action)]:.2f}")
-
-    def select_action(self, state):
-        """基于 epsilon-greedy 策略选择动作"""
-        possible_actions = self.get_possible_actions()
-        if not possible_actions:
-            return None
-        if np.random.rand() < EPSILON:  # 探索
-            return random.choice(possible_actions)
-        else:  # 利用
-            return max(possible_actions, key=lambda a: self.q_table.get((state, a), 0.0))
-
-    def initialize_q_table(self):
-        """为工作站初始化 Q 表"""
-        for i in range(len(self.input_queue)):
-            for j in range(i + 1, len(self.input_queue)):
-                state = self.get_current_state()
-                action = (i, j)  # 交换两个瓶子的动作
-                self.q_table[(state, action)] = 0.0  # 初始化 Q 值为 0
-
-    def my_workstation_policy(self):
-        ''' Machine Policy Here '''
-        if self.workstation_policy == 'FIFO':
-            # update machine states
-            for machine in self.machines:
-                if machine.state == DeviceState.Idle and self.input_queue_len > 0:
-                    temp_job = self.input_queue.pop(0)
-                    self.input_queue_len = len(self.input_queue)
-                    machine.add_job(temp_job)
-                machine.update()
-        elif self.workstation_policy == 'RANDOM':
-            # update machine states
-            for machine in self.machines:
-                if machine.state == DeviceState.Idle and self.input_queue_len > 0:
-                    temp_job = random.choice(self.input_queue)
-                    self.input_queue.remove(temp_job)
-                    self.input_queue_len = len(self.input_queue)
-                    machine.add_job(temp_job)
-                machine.update()
-        elif self.workstation_policy == 'NEH':
-            # NEH policy, find the total processing time of each job (the sum of processing times across all machines).
-            for machine in self.machines:
-                if machine.state == DeviceState.Idle and self.input_queue_len > 0:
-                    self.NEH_ws_policy()
-                    self.input_queue_len = len(self.input_queue)
-                    #machine.add_job(temp_job)
-                machine.update()
-        elif self.robot_policy == 'Q_LEARNING_QUEUE':
-            for ws in self.workstations:
-                state = ws.get_current_state()  # 获取当前状态
-                action = ws.select_action(state)  # 选择动作
-                if action is None:
-                    continue  # 如果没有动作可执行，跳过
-
-                # 执行动作调整队列
-                ws.adjust_queue(action)
-
-                # 计算奖励并更新 Q 表
-                next_state = ws.get_current_state()
-                reward = ws.compute_reward(ws.input_queue, ws.input_queue)  # 比较调整前后队列的奖励
-                ws.update_q_table(state, action, reward, next_state)
-
-    def NEH_ws_policy(self):
-        """
-        NEH policy for job assignment to machines. This policy sorts jobs by total processing time and assigns
-        them in a way that minimizes makespan (completion time).
-        """
-        # Step 1: Calculate total processing time for each job
-        job_total_times = []
-        for job in self.input_queue:
-            #total_time = sum(job.service_time_list)  # Sum of processing times across all machines
-            job_total_times.append((job, job.total_process_time))
-
-        # Step 2: Sort jobs in descending order by total processing time
-        job_total_times.sort(key=lambda x: x[1], reverse=True)  # Sort by total time (descending)
-
-        # Step 3: Assign jobs to machines
-        for job, _ in job_total_times:
-            # Find an idle machine and assign the job
-            assigned = False  # Flag to track if the job was assigned
-
-            for machine in self.machines:
-                if machine.state == DeviceState.Idle:
-                    # Add the job to the machine
-                    self.input_queue.remove(job)  # Remove job from queue
-                    machine.add_job(job)  # Assign job to the machine
-                    assigned = True  # Mark job as assigned
-                    break  # Exit the machine loop once job is assigned
-
-            if not assigned:
-                # If no idle machine was found for this job, it remains in the queue.
-                break  # Exit the loop if no machines are available for further job assignment
-
-
-    def update(self):
-        self.update_time()
+        # machine availability, kept up to date by Machine.add_job / drop_job
+        self.idle_machines = list(range(self.num_machines))  # heap of idle machine indices
+        self.busy_machines = {}  # busy machine -> None, in the order they started
+        self.num_busy_machines = 0
+        self.busy_machine_stat = TimeAverage()  # time integral of num_busy_machines
+
+        self.workstation_policy = self.scenario.workstation_policy
+
+    @property
+    def workstation_policy(self):
+        return self.workstation_policy_name
+
+    @workstation_policy.setter
+    def workstation_policy(self, policy_name):
+        # resolve the policy object once, the input queue type follows the policy
+        self.policy = make_workstation_policy(policy_name, self)
+        self.workstation_policy_name = policy_name
+        self.input_queue = self.policy.make_queue(self.input_queue)
+
+    def set_machine_busy(self, machine):
+        if self.idle_machines and self.idle_machines[0] == machine.index:
+            heapq.heappop(self.idle_machines)
+        else:
+            self.idle_machines.remove(machine.index)
+            heapq.heapify(self.idle_machines)
+        self.busy_machines[machine] = None
+        self.num_busy_machines += 1
+        self.busy_machine_stat.update(machine.total_run_time, self.num_busy_machines)
+
+    def set_machine_idle(self, machine):
+        heapq.heappush(self.idle_machines, machine.index)
+        del self.busy_machines[machine]
+        self.num_busy_machines -= 1
+        self.busy_machine_stat.update(machine.total_run_time, self.num_busy_machines)
+        self.policy.on_machine_idle(machine)
+
+    def assign_job(self, job, dt=0):
+        '''
+        Start the job on the idle machine with the lowest index
+        :param dt: time step of this update, the machine starts at the beginning of the step
+        '''
+        machine = self.machines[self.idle_machines[0]]
+        machine.sync_time(self.total_run_time - dt)
+        return machine.add_job(job)
+
+    def sync_machines(self):
+        # bring the clocks of the idle machines up to date (for statistics / display)
+        for machine in self.machines:
+            machine.sync_time(self.total_run_time)
+
+    def my_workstation_policy(self, dt=BACKEND_CYCLE_TIME):
+        ''' Machine Policy Here (see policy.py), runs only after a job was queued or a machine got idle '''
+        self.policy.run(dt)
+
+    def update(self, dt=BACKEND_CYCLE_TIME):
+        self.update_time(dt)
 
         # customized workstation policy
-        self.my_workstation_policy()
+        self.my_workstation_policy(dt)
+
+        # only busy machines advance every step (idle ones are synced when they get a job)
+        for machine in list(self.busy_machines):
+            machine.update(dt)
 
         # curr state:
-        if any(machine.state == DeviceState.Busy for machine in self.machines):
+        if self.num_busy_machines > 0:
             self.state = DeviceState.Busy
         else:
             self.state = DeviceState.Idle
 
         # timing
-        # use mean time of utilization of all machines
-        self.time_utilization = np.mean([machine.time_utilization for machine in self.machines])
+        # mean time of utilization of all machines, from the busy machine-time integral
+        self.time_utilization = self.busy_machine_stat.mean(self.total_run_time) / self.num_machines
 
-        # 在 device.py 文件的 Workstation 类的 update() 方法末尾加入
-        with open('queue_log_40_R_random_W_random_646444.csv', 'a') as f:
-            f.write(f"{self.total_run_time},{self.index},{self.input_queue_len}\n")
+        # queue length trace
+        if self.parent.trace is not None:
+            self.parent.trace.record_queue(self.total_run_time, self.index, self.input_queue_len, self.output_queue_len)
 
     def add_job(self, job):
 
@@ -319,85 +332,109 @@ class Workstation(Device):
         job.curr_workstation = self  # <--------------- Edit Job
 
         self.input_queue.append(job)
-        self.input_queue_len = len(self.input_queue)
+        self.record_input_queue_len()
+        self.change_num_in_system(1)
+        self.policy.on_job_queued(job)
 
         # record
         self.input_job_count[job.type] += 1
         self.total_input_job += 1
+
+        # a new job is queueing: give idle machines a chance at once
+        self.schedule_event(0, EventType.Settle)
         return RTN_OK
 
     def drop_job(self, job):
         self.output_queue.remove(job)
-        self.output_queue_len -= 1
 
         # record
         self.output_job_count[job.type] += 1
         self.total_output_job += 1
         return RTN_OK
 
-    def draw(self, screen):
-
-        # Create text to be showed on screen
-        show_text_list = [(f'**{self.name}** ', COLOR_LIGHT_GREY)]
-
-        # Add machine info to the text
-        for machine in self.machines:
-            status_text, color = machine.get_show_text()
-            show_text_list.append((status_text, color))
-
-        # Display the mean busy ratio of the machines in this workstation
-        show_text_list.append((f'Time Util:{self.time_utilization * 100:3.0f}%', COLOR_LIGHT_BLUE))
-        show_text_list.append((f'Q_Out: {[temp_job.name for temp_job in self.output_queue]}', COLOR_LIGHT_BLUE))
-        show_text_list.append((f'Output: {self.total_output_job}', COLOR_LIGHT_BLUE))
-        show_text_list.append((f'Queue: {self.input_queue_len}', COLOR_LIGHT_BLUE))
-
-        # Draw the text box at the designated position
-        box_pos = map_to_screen(self.pos)
-        if self.pos[1] > 0:  # For top workstations, bottom center aligned
-            draw_text_box(screen, show_text_list, box_pos, top_center=False, align_center=False)
-        else:  # For lower workstations, top center aligned
-            draw_text_box(screen, show_text_list, box_pos, top_center=True, align_center=False)
+    def snapshot(self):
+        self.sync_machines()  # idle machine clocks, for the statistics
+        return WorkstationSnapshot(name=self.name,
+                                   pos=self.pos,
+                                   machines=tuple(machine.snapshot() for machine in self.machines),
+                                   time_utilization=self.time_utilization,
+                                   output_queue=tuple(job.name for job in self.output_queue),
+                                   total_output_job=self.total_output_job,
+                                   input_queue_len=self.input_queue_len,
+                                   lq=self.get_lq(),
+                                   wq=self.get_wq())
 
 
 class Robot(Device):
     def __init__(self, parent=None, index=0, name='', pos=(-200,75)):
         super().__init__(parent, index, name, pos)
 
-        self.speed = ROBOT_SPEED
+        self.speed = self.scenario.robot_speed
 
         self.curr_job = None
         self.pick_up_workstation = None  # 收货位置
         self.deliver_workstation = None  # 送货位置
-        self.target_pos = FACTORY_POS  # 当前目标
+        self.target_pos = self.scenario.factory_pos  # 当前目标
 
-        self.distance_travelled_pct = 0
         self.total_distance_travelled = 0
 
-    def update(self):
-        self.update_time()
+    # Motion is analytic: a trip is (trip_origin, target_pos, depart_time, arrival_time),
+    # the position is only interpolated when it is read (GUI, dispatch)
+    @property
+    def pos(self):
+        if self.state == DeviceState.Idle or self.arrival_time <= self.depart_time:
+            return self.trip_origin
+        travel_fraction = min(max((self.total_run_time - self.depart_time) /
+                                  (self.arrival_time - self.depart_time), 0.0), 1.0)
+        return (self.trip_origin[0] + (self.target_pos[0] - self.trip_origin[0]) * travel_fraction,
+                self.trip_origin[1] + (self.target_pos[1] - self.trip_origin[1]) * travel_fraction)
+
+    @pos.setter
+    def pos(self, pos):
+        # stand still at pos
+        self.trip_origin = pos
+        self.trip_distance = 0
+        self.depart_time = 0
+        self.arrival_time = 0
+
+    @property
+    def distance_travelled_pct(self):
+        if self.state == DeviceState.Idle or self.arrival_time <= self.depart_time:
+            return 0
+        return min((self.total_run_time - self.depart_time) / (self.arrival_time - self.depart_time), 1.0) * 100
+
+    def start_trip(self, target_pos):
+        # leave the current station, the arrival time is known in closed form
+        self.trip_origin = self.pos
+        self.target_pos = target_pos
+        self.trip_distance = self.parent.layout.get_distance(self.trip_origin, self.target_pos)
+        self.depart_time = self.total_run_time
+        self.arrival_time = self.depart_time + self.trip_distance / self.speed
+        self.schedule_event(self.trip_distance / self.speed, EventType.RobotArrival)
+
+    def update(self, dt=BACKEND_CYCLE_TIME):
+        self.update_time(dt)
 
         if self.state == DeviceState.Idle:
             return
 
-        # in busy state
-        dx, dy, dist = calculate_distance(self.pos, self.target_pos)
-
         # if arrived:
-        if dist <= self.speed * BACKEND_CYCLE_TIME:
+        if self.total_run_time >= self.arrival_time - EPS:
+            self.total_distance_travelled += self.trip_distance
             self.pos = self.target_pos  # Snap to target position
-            self.distance_travelled_pct = 0
 
             # 空载跑 -> 去收货 -> 继续送货（BUSY）
             if not self.is_loaded:
                 self.state = DeviceState.Busy
                 if self.pick_up_workstation == self.parent:
                     self.parent.input_queue.remove(self.curr_job)
-                    self.parent.input_queue_len -= 1
+                    self.parent.record_input_queue_len()
                 else:
                     self.pick_up_workstation.drop_job(self.curr_job)
                 self.curr_job.state = JobState.Moving  # <--------------- Edit Job
-                self.target_pos = self.curr_job.next_workstation.pos
                 self.is_loaded = True
+                self.start_trip(self.curr_job.next_workstation.pos)
+                self.record_trace()
 
             # 载货跑 -> 去送货 -> IDLE
             else:
@@ -408,14 +445,7 @@ class Robot(Device):
                     self.deliver_workstation.add_job(self.curr_job)
                 self.drop_job(self.curr_job)
                 self.is_loaded = False
-
-        else:  # not arrived
-            self.state = DeviceState.Busy
-            distance_travelled = self.speed * BACKEND_CYCLE_TIME
-            travel_fraction = distance_travelled / dist
-            self.pos = (self.pos[0] + dx * travel_fraction, self.pos[1] + dy * travel_fraction)
-            self.total_distance_travelled += distance_travelled
-            self.distance_travelled_pct = min(self.distance_travelled_pct + travel_fraction * 100, 100)  # Cap at 100%
+                self.parent.policy.on_robot_idle(self)
 
     def add_job(self, job):
         '''
@@ -429,6 +459,7 @@ class Robot(Device):
             return RTN_ERR
 
         job.state = JobState.Waiting  # <--------------- Edit Job
+        job.parent.dispatch_index.remove_ready(job, job.curr_workstation.node)
 
         self.curr_job = job
         self.state = DeviceState.Busy
@@ -436,7 +467,7 @@ class Robot(Device):
 
         self.pick_up_workstation = job.curr_workstation
         self.deliver_workstation = job.next_workstation
-        self.target_pos = self.pick_up_workstation.pos
+        self.start_trip(self.pick_up_workstation.pos)
 
         self.is_loaded = False
 
@@ -444,6 +475,8 @@ class Robot(Device):
         self.input_job_count[job.type] += 1
         self.total_input_job += 1
 
+        self.record_trace()
+
         return RTN_OK
 
     def drop_job(self, job):
@@ -454,40 +487,32 @@ class Robot(Device):
 
         self.pick_up_workstation = None
         self.deliver_workstation = None
-        self.target_pos = FACTORY_POS
+        self.target_pos = self.scenario.factory_pos
 
         self.is_loaded = False
 
         # record
         self.output_job_count[job.type] += 1
         self.total_output_job += 1
+        self.record_trace()
 
         return RTN_OK
 
-    def draw(self, screen):
-        font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE)
-
-        if self.state == DeviceState.Busy:
-            if self.is_loaded:
-                color = COLOR_GREEN
-            else:
-                color = COLOR_WHITE
-        else:
-            color = COLOR_YELLOW
-        screen_pos = map_to_screen(self.pos)
-
-        pygame.draw.circle(screen, color, screen_pos, ROBOT_DIAMETER // 2)
-
-        # show name
-        robot_mark_text = font.render(f'{self.name}', True, COLOR_BLACK)
-        screen.blit(robot_mark_text, (screen_pos[0] - 8, screen_pos[1] - 8))
+    def record_trace(self):
+        trace = self.parent.trace
+        if trace is not None:
+            trace.record_robot(self.total_run_time, self.index, self.state.value, self.is_loaded)
 
-        # show percentage
-        percentage_text = f'{int(self.distance_travelled_pct)}%'
-        if self.curr_job:
-            percentage_text += f'[{self.curr_job.name}]'
-        percentage_text = font.render(percentage_text, True, COLOR_BLACK)
-        screen.blit(percentage_text, (screen_pos[0] - 15, screen_pos[1] - 35))
+    def snapshot(self):
+        return RobotSnapshot(name=self.name,
+                             pos=self.pos,
+                             is_busy=self.state == DeviceState.Busy,
+                             is_loaded=self.is_loaded,
+                             distance_travelled_pct=self.distance_travelled_pct,
+                             job_name=self.curr_job.name if self.curr_job else '',
+                             time_utilization=self.time_utilization,
+                             total_input_job=self.total_input_job,
+                             total_output_job=self.total_output_job)
 
 
 class Factory(Device):
@@ -495,93 +520,109 @@ class Factory(Device):
     One Factory is composed of several workstations, several robots, and the input/output ports
     """
 
-    def __init__(self, parent=None, index=0, name='', pos=FACTORY_POS):
-        super().__init__(parent, index, name, pos)
+    def __init__(self, parent=None, index=0, name='', pos=None, scenario=None):
+        '''
+        :param pos: entry position, None for scenario.factory_pos
+        :param scenario: Scenario of this factory, None for DEFAULT_SCENARIO (the values of global_def)
+        '''
+        if scenario is None:
+            scenario = DEFAULT_SCENARIO
+        super().__init__(parent, index, name, scenario.factory_pos if pos is None else pos, scenario)
+
+        self.node = 0  # station node of the entry
+        self.layout = scenario.layout
 
         # init all workstations
-        self.num_workstations = NUM_WORKSTATIONS
+        self.num_workstations = scenario.num_workstations
         self.workstations = [Workstation(parent=self,
                                          index=i_workstation,
                                          name=f'W{i_workstation + 1}',
-                                         pos=WORKSTATION_POS[i_workstation])
+                                         pos=scenario.workstation_pos[i_workstation])
                              for i_workstation in range(self.num_workstations)]
 
         # init all robots
-        self.num_robots = NUM_ROBOTS
+        self.num_robots = scenario.num_robots
         self.robots = [Robot(parent=self,
                              index=i_robot,
                              name=f'R{i_robot + 1}',
-                             pos=FACTORY_POS)
+                             pos=scenario.factory_pos)
                        for i_robot in range(self.num_robots)]
-        self.robot_policy = ROBOT_POLICY_NAME
 
-        # all jobs
-        self.job_times = []
-        self.jobs = []
-        self.curr_job_index = 0
+        # station per node: 0 entry, i workstation i
+        self.stations = [self] + self.workstations
+
+        # all jobs (JobStore)
+        self.jobs = JobStore([], [], [], [0], scenario)
+        self.job_times = self.jobs.arrival_times
+        self.arrival_cursor = ArrivalCursor(self.job_times)
         self.total_num_jobs = 0
 
-        self.is_job_alive = []
+        # alive jobs in JobState.Ready waiting for a robot, per station
+        self.dispatch_index = DispatchIndex(self.stations, self.layout)
+        self.ready_jobs = self.dispatch_index.ready_jobs
+
+        self.robot_policy = scenario.robot_policy
+
+        # Q table shared by the Q_LEARNING_QUEUE workstations (None: created on first use)
+        self.q_table = None
 
         # pause
         self.is_paused = False
 
+        # next-event engine driving this factory (None: fixed-tick update)
+        self.event_engine = None
+
+        # queue length trace (None: no trace)
+        self.trace = None
+
+    @property
+    def robot_policy(self):
+        return self.robot_policy_name
+
+    @robot_policy.setter
+    def robot_policy(self, policy_name):
+        # resolve the policy object once (it also sets the priority key of the dispatch index)
+        self.policy = make_robot_policy(policy_name, self)
+        self.robot_policy_name = policy_name
+
+    def add_ready_job(self, job, node):
+        # a job waits for a robot at the station node
+        self.dispatch_index.add_ready(job, node)
+        self.policy.on_job_ready(job, node)
+
     def set_jobs(self, job_times, jobs):
         '''
-        添加预先生成的Job列表，并初始化Job内部参数
-        :param job_times:
-        :param jobs:
+        添加预先生成的JobStore，Job内部参数在到达时才初始化
+        :param job_times: sorted arrival times, jobs.arrival_times (only indexed, not copied)
+        :param jobs: JobStore, generated with the job types of this factory's scenario
         :return:
         '''
+        if jobs.scenario.job_routing != self.scenario.job_routing:
+            raise ValueError(f'JOBS of scenario {jobs.scenario.name} do not match factory scenario {self.scenario.name}')
         self.job_times = job_times
         self.jobs = jobs
-        for job in self.jobs:
-            job.parent = self
-            job.routing_workstation_list = [self.workstations[job.routing_list[i_routine] - 1]
-                                            for i_routine in range(len(job.routing_list))]
-            job.state = JobState.Ready  # <--------------- Edit Job
-            #job.pos = self.pos
-            job.pos = (-300, 0)  # Job 生成在 (-300, 0)
-
-            job.curr_workstation = self
-            job.next_workstation = job.routing_workstation_list[0]
+        self.jobs.parent = self
+        self.arrival_cursor = ArrivalCursor(job_times)
 
         self.total_num_jobs = len(self.jobs)
 
-        self.is_job_alive = [False for job in self.jobs]
+    def init_job(self, job):
+        '''
+        初始化到达的Job内部参数 (next_workstation 由 curr_routing_index 得出)
+        '''
+        job.state = JobState.Ready  # <--------------- Edit Job
+        job.curr_workstation = self
 
     def generate_job(self):
-        # 创建新任务并加入初始化列表
+        # 取出到当前时刻为止到达的任务（含最后一个）
         new_job_list = []
-
-        if self.curr_job_index >= self.total_num_jobs - 1:
-            return []
-
-        for i in range(self.curr_job_index, self.total_num_jobs):
-            if self.total_run_time >= self.job_times[i]:
-                new_job_list.append(self.jobs[i])
-            else:
-                self.curr_job_index = i
-                break
+        for i_job in self.arrival_cursor.pop_due(self.total_run_time):
+            new_job = self.jobs[i_job]  # Job view of row i_job
+            self.init_job(new_job)
+            new_job_list.append(new_job)
 
         return new_job_list
 
-    def NEH_robot_policy(self, job_list):
-        """
-        NEH policy for job assignment to machines. This policy sorts jobs by total processing time and assigns
-        them in a way that minimizes makespan (completion time).
-        """
-        # Step 1: Calculate total processing time for each job
-        job_total_times = []
-        for job in job_list:
-            job_total_times.append((job, job.total_process_time))
-
-        # Step 2: Sort jobs in descending order by total processing time
-        job_total_times.sort(key=lambda x: x[1], reverse=True)  # Sort by total time (descending)
-
-        return job_total_times[0][0]
-    
-
     def run_my_policy(self):
         # TODO
         # policy default: based on random assigned jobs
@@ -591,74 +632,8 @@ class Factory(Device):
         # policy J_1: Job-oriented, target is to minimize the job queueing/waiting time 
         #           or maximize job throughput
 
-        # random
-        if self.robot_policy == 'DEFAULT':
-            for robot in self.robots:
-                if robot.state == DeviceState.Idle:
-                    ready_jobs = [self.jobs[i_job]
-                                  for i_job in range(self.total_num_jobs)
-                                  if self.is_job_alive[i_job] is True
-                                  and self.jobs[i_job].state == JobState.Ready]
-                    if len(ready_jobs) > 0:
-                        temp_job = random.choice(ready_jobs)
-                        robot.add_job(temp_job)
-        # Robot-oriented policy: Maximize robot utilization
-        elif self.robot_policy == 'DISTANCE' or self.robot_policy == 'DISTANCE_NEH':
-            for robot in self.robots:
-                if robot.state == DeviceState.Idle:
-                    # Find the closest workstation with jobs in the output queue
-                    closest_workstation = None
-                    min_distance = float('inf')
-                    for workstation in self.workstations:
-                        if workstation.output_queue_len > 0 and \
-                            any(tmp_job.state == JobState.Ready for tmp_job in workstation.output_queue):
-                            # Calculate distance between robot and workstation
-                            dx, dy, distance = calculate_distance(robot.pos, workstation.pos)
-                            if distance < min_distance:
-                                min_distance = distance
-                                closest_workstation = workstation
-                    if (self.input_queue_len > 0 and \
-                            any(tmp_job.state == JobState.Ready for tmp_job in self.input_queue)):
-                        dx, dy, distance = calculate_distance(robot.pos, self.pos)
-                        if distance < min_distance:
-                            min_distance = distance
-                            closest_workstation = self
-                    #print(closest_workstation.index)
-                    # If a workstation with jobs is found, move the robot to pick up the job
-                    if closest_workstation:
-                        if closest_workstation != self:
-                            tmp_queue = closest_workstation.output_queue
-                            #choosable_jobs = [tmp_job for tmp_job in tmp_queue if tmp_job.state == JobState.Ready]
-                        else:
-                            tmp_queue = self.input_queue
-                        choosable_jobs = [tmp_job for tmp_job in tmp_queue if tmp_job.state == JobState.Ready]
-                        if self.robot_policy == 'DISTANCE_NEH':
-                            temp_job = self.NEH_robot_policy(choosable_jobs)
-                        else:
-                            temp_job = random.choice(choosable_jobs)
-                        robot.add_job(temp_job)
-
-        elif self.robot_policy == 'Q_LEARNING_QUEUE':
-            for ws in self.workstations:
-                state = ws.get_current_state()  # 获取当前状态
-                action = ws.select_action(state)  # 选择动作
-                if action is None:
-                    continue  # 如果没有动作可执行，跳过
-
-                # 打印调整前的队列状态
-                print(f"Queue before adjustment: {state}")
-
-                # 执行动作调整队列
-                ws.adjust_queue(action)
-
-                # 打印调整后的队列状态
-                next_state = ws.get_current_state()
-                print(f"Queue after adjustment: {next_state}")
-
-                # 计算奖励并更新 Q 表
-                reward = ws.compute_reward(ws.input_queue, ws.input_queue)  # 比较调整前后队列的奖励
-                print(f"Reward: {reward}")  # 打印奖励信息
-                ws.update_q_table(state, action, reward, next_state)
+        # robot policy object (see policy.py), runs only after a job got ready or a robot got idle
+        self.policy.run()
 
         # # Machine-oriented policy: Maximize machine/workstation utilization
         # elif self.robot_policy == 'M1':
@@ -697,14 +672,14 @@ class Factory(Device):
 
         # elif self.robot_policy == 'NA':
         #     pass
-        else:
-            raise ValueError(f'POLICY_NAME {self.robot_policy} not recognized')
 
-    def update(self):
+    def update(self, dt=None):
         if self.is_paused:
             return
+        if dt is None:
+            dt = self.scenario.backend_cycle_time
 
-        self.update_time()
+        self.update_time(dt)
 
         # 随机产生新的job
         new_jobs = self.generate_job()
@@ -713,11 +688,11 @@ class Factory(Device):
 
         # update all workstations
         for workstation in self.workstations:
-            workstation.update()
+            workstation.update(dt)
 
         # update all robots
         for robot in self.robots:
-            robot.update()
+            robot.update(dt)
 
         # Run user-defined policy
         self.run_my_policy()
@@ -725,11 +700,11 @@ class Factory(Device):
     def add_job(self, job):
         job.state = JobState.Ready  # <--------------- Edit Job
         job.start_time = self.total_run_time  # <--------------- Edit Job
+        self.add_ready_job(job, self.node)
 
         self.input_queue.append(job)
-        self.input_queue_len = len(self.input_queue)
-
-        self.is_job_alive[job.index] = True
+        self.record_input_queue_len()
+        self.change_num_in_system(1)
 
         # record
         self.input_job_count[job.type] += 1
@@ -740,213 +715,51 @@ class Factory(Device):
 
         job.state = JobState.Perished  # <--------------- Edit Job
         job.end_time = self.total_run_time  # <--------------- Edit Job
-        job.total_busy_time = job.end_time - job.start_time  # <--------------- Edit Job
 
-        self.is_job_alive[job.index] = False
+        self.change_num_in_system(-1)
 
         # record
         self.output_job_count[job.type] += 1
         self.total_output_job += 1
         return RTN_OK
 
+    def end_run(self):
+        # the run is over: let the workstation policies close their episode (Q_LEARNING_QUEUE terminal update)
+        for workstation in self.workstations:
+            workstation.policy.on_run_end()
+
     def process_cmd(self, cmd):
         print(f"Processing command: {cmd}")
         pass
 
-    def draw(self, screen):
-        ''''''
-
-        '''Factory State'''
-        # Create text to be showed on screen
-        show_text_list = [
-            (f'**{self.name}**', COLOR_LIGHT_GREY),
-            (f'Time: {seconds_to_hhmmss(self.total_run_time)}', COLOR_LIGHT_BLUE),
-            (f'Out: {self.total_output_job}', COLOR_LIGHT_BLUE),
-            (f'Out: {self.total_output_job / self.total_run_time * 3600:.1f} /h', COLOR_LIGHT_BLUE),
-            (f'In: {self.total_input_job}', COLOR_LIGHT_BLUE),
-            (f'In: {self.total_input_job / self.total_run_time * 3600:.1f} /h', COLOR_LIGHT_BLUE),
-            (f'(In-Out): {self.total_input_job - self.total_output_job}', COLOR_LIGHT_BLUE),
-            (f'Queue: {int(self.input_queue_len)}', COLOR_LIGHT_BLUE)
-        ]
-
-        # Draw the text box at the designated position, top center aligned
-        #box_pos = map_to_screen(self.pos)
-        # 如果是 Entry 工厂，使用专门的绘制大框方法
-        if self.name == 'Entry':
-            box_pos = map_to_screen((self.pos[0]-100, self.pos[1]+500))
-            self.draw_entry_box(screen, show_text_list, box_pos, max_width=200, max_height=600)
-        else:
-            # 对于其他工厂，使用通用的绘制方法
-            box_pos = map_to_screen((self.pos[0], self.pos[1]))
-            draw_text_box(screen, show_text_list, box_pos, top_center=True, align_center=False, max_width=300)  # 默认大小
-        for workstation in self.workstations:
-            workstation.draw(screen)
-
-        for robot in self.robots:
-            robot.draw(screen)
-
-        '''Job State'''
-        # Show job status on the side:
-        box_pos = map_to_screen((self.pos[0] + WORLD_WIDTH * 0.5 + 370,
-                                 self.pos[1] + WORLD_HEIGHT))
-        side_text = []
-        i_plot = 0
-        total_alive_job = sum(self.is_job_alive)
-        job_time_mean = np.mean([job.total_busy_time for job in self.jobs if job.total_busy_time is not None])
-        side_text.append((f'Total alive jobs: {total_alive_job}', COLOR_LIGHT_GREY))
-        side_text.append((f'> Job Total Time (mean): {job_time_mean:.1f} s', COLOR_LIGHT_GREY))
-
-        MAX_JOB_TO_SHOW = 10
-        for i_job in range(self.total_num_jobs):
-            if i_plot >= MAX_JOB_TO_SHOW:
-                break
-            if self.is_job_alive[i_job]:
-                i_plot += 1
-                temp_job = self.jobs[i_job]
-                temp_text = f'{temp_job.name}|'
-                temp_text += f'idx {temp_job.curr_routing_index}|'
-                temp_text += f'{temp_job.routing_list}|'
-                temp_text += f'{temp_job.state}'[9:]
-                temp_text += f' @ {temp_job.curr_workstation.name}'
-                side_text.append((temp_text, COLOR_LIGHT_BLUE))
-        draw_text_box(screen, side_text, box_pos,
-                      top_center=True, align_center=False, show_box=False,
-                      max_width=420)
-
-        '''Robot State'''
-        # Show robot status on the side:
-        box_pos = map_to_screen((self.pos[0] + WORLD_WIDTH * 0.5 + 370,
-                                 self.pos[1] + WORLD_HEIGHT - 450))
-        side_text = []
-        i_plot = 0
-        total_busy_robot = sum([robot.state == DeviceState.Idle for robot in self.robots])
-        mean_robot_util = np.mean([robot.time_utilization for robot in self.robots])
-        side_text.append((f'Total Busy Robots: {total_busy_robot}', COLOR_LIGHT_GREY))
-        side_text.append((f'> Robot Time Util (mean): {mean_robot_util * 100:3.0f}%', COLOR_LIGHT_GREY))
-
-        MAX_ROBOT_TO_SHOW = 10
-        for temp_robot in self.robots:
-            if i_plot >= MAX_ROBOT_TO_SHOW:
-                break
-
-            i_plot += 1
-            temp_text = f'{temp_robot.name}|'
-            temp_text += f'Time Util: {temp_robot.time_utilization * 100:3.0f}%|'
-            temp_text += f'In: {temp_robot.total_input_job}|'
-            temp_text += f'Out: {temp_robot.total_output_job}|'
-            temp_text += f'{temp_robot.state}'[12:]
-            side_text.append((temp_text, COLOR_LIGHT_BLUE))
-
-        draw_text_box(screen, side_text, box_pos,
-                      top_center=True, align_center=False, show_box=False,
-                      max_width=420)
-
-    def draw_entry_box(self, screen, show_text_list, position, max_width=400, max_height=600):
-        """
-        为 'Entry' 工厂画一个专门的大框
-        """
-        line_height = 70  # 行高
-        padding = 5
-        total_height = len(show_text_list) * line_height + padding  # 计算总高度
-        regular_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE)
-        bold_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE, bold=True)
-        italic_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE, italic=True)
-        # 如果设置了最大高度，并且总高度超过了最大高度，则设置为最大高度
-        if total_height > max_height:
-            total_height = max_height
-
-        box_x = position[0] - max_width // 2
-        box_y = position[1] + 30  # Adjust position for better visibility
-
-        # 绘制大框和边框
-        pygame.draw.rect(screen, COLOR_BLACK, (box_x - 5, box_y - 5, max_width + 10, total_height + 10), 2)
-
-        # 绘制文本内容
-        for i, (text, bg_color) in enumerate(show_text_list):
-            line_rect = pygame.Rect(box_x, box_y + i * line_height, max_width, line_height)
-            pygame.draw.rect(screen, bg_color, line_rect)
-
-            words = text.split(' ')
-            x_offset = line_rect.left + 10
-
-            for word in words:
-                word_font = regular_font
-                word_surface = word_font.render(word, True, COLOR_BLACK)
-                word_rect = word_surface.get_rect()
-                word_rect.topleft = (x_offset, line_rect.centery - word_rect.height // 2)
-                screen.blit(word_surface, word_rect)
-                x_offset += word_rect.width + 5
-
-
-def seconds_to_hhmmss(seconds):
-    # Calculate hours, minutes, and seconds
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    seconds = seconds % 60
-    # Return in hh:mm:ss format
-    return f'{int(hours):02}:{int(minutes):02}:{int(seconds):02}'
-
-# Draw text box function for top center alignment
-def draw_text_box(screen, text_lines, position,
-                  top_center=True,
-                  align_center=True,
-                  show_box=True,
-                  max_width=200, max_height = None):
-    # Create fonts only once for efficiency
-    regular_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE)
-    bold_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE, bold=True)
-    italic_font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE, italic=True)
-
-    line_height = 26
-    padding = 5
-    total_height = len(text_lines) * line_height + padding
-    # 如果设置了最大高度，并且总高度超过了最大高度，则设置为最大高度
-    if max_height and total_height > max_height:
-        total_height = max_height
-
-        # 将文本裁剪为适应框高的内容
-        max_lines = max_height // line_height
-        text_lines = text_lines[:max_lines]  # 只保留显示框内的行
-
-
-    # Calculate the top left position to center the text box at the top/bottom center of the Box
-    box_x = position[0] - max_width // 2
-    box_y = position[1] + 30 if top_center else position[1] - total_height - 40
-
-    # Draw the black border around the text box
-    if show_box:
-        pygame.draw.rect(screen, COLOR_BLACK, (box_x - 5, box_y - 5, max_width + 10, total_height + 10), 2)
-
-    # Preprocess text and split once per line
-    for i, (text, bg_color) in enumerate(text_lines):
-        line_rect = pygame.Rect(box_x, box_y + i * line_height, max_width, line_height)
-        pygame.draw.rect(screen, bg_color, line_rect)
-
-        # Split the text into words and process bold/italic tags
-        words = text.split(' ')
-        x_offset = line_rect.left + 10
-
-        for word in words:
-            # Check for bold/italic tags once, strip them, and select the correct font
-            if word.startswith('**') and word.endswith('**'):
-                word = word[2:-2]
-                word_font = bold_font
-            elif word.startswith('*') and word.endswith('*'):
-                word = word[1:-1]
-                word_font = italic_font
-            else:
-                word_font = regular_font
-
-            # Render the word
-            word_surface = word_font.render(word, True, COLOR_BLACK)
-            word_rect = word_surface.get_rect()
-
-            # Vertically center the word
-            word_rect.topleft = (x_offset, line_rect.centery - word_rect.height // 2)
-
-            # Draw the word on the screen
-            screen.blit(word_surface, word_rect)
-
-            # Update the x_offset for the next word
-            x_offset += word_rect.width + 5
-
+    def snapshot(self):
+        '''
+        Immutable copy of everything the GUI shows, call from the thread that updates the factory
+        :return: FactorySnapshot
+        '''
+        alive_job_indices = np.flatnonzero(self.jobs.get_alive_mask())
+        busy_times = self.jobs.get_busy_times()
+        alive_jobs = []
+        for i_job in alive_job_indices[:MAX_JOB_TO_SHOW]:
+            temp_job = self.jobs[int(i_job)]
+            alive_jobs.append(JobSnapshot(name=temp_job.name,
+                                          routing_index=temp_job.curr_routing_index,
+                                          routing_list=temp_job.routing_list,
+                                          state=temp_job.state,
+                                          station_name=temp_job.curr_workstation.name))
+
+        return FactorySnapshot(name=self.name,
+                               pos=self.pos,
+                               total_run_time=self.total_run_time,
+                               total_input_job=self.total_input_job,
+                               total_output_job=self.total_output_job,
+                               input_queue_len=self.input_queue_len,
+                               lq=self.get_lq(),
+                               wq=self.get_wq(),
+                               l=self.get_l(),
+                               w=self.get_w(),
+                               workstations=tuple(workstation.snapshot() for workstation in self.workstations),
+                               robots=tuple(robot.snapshot() for robot in self.robots),
+                               total_alive_job=len(alive_job_indices),
+                               job_time_mean=float(np.mean(busy_times)) if len(busy_times) else math.nan,
+                               alive_jobs=tuple(alive_jobs))
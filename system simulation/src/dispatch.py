@@ -0,0 +1,64 @@
+from global_def import *
+from job_queue import *
+
+
+class DispatchIndex:
+    """
+    Index of the jobs waiting for a robot, per station node
+    -> node 0: factory entry, node i: workstation i (same numbering as JOB_ROUTING)
+    -> kept in sync by Factory.add_job / Machine.drop_job (job Ready) and Robot.add_job (job Waiting)
+    -> nearest_station() is a vectorized argmin over the stations that have ready jobs
+    -> with a priority key, the ready jobs of every node are also kept in a JobPriorityQueue
+    """
+
+    def __init__(self, stations, layout, priority_key=None):
+        self.stations = stations  # station device per node
+        self.layout = layout  # station-to-station distance matrix
+
+        self.ready_jobs = JobSet()  # all ready jobs
+        self.ready_sets = [JobSet() for station in stations]  # ready jobs per node
+        self.ready_count = np.zeros(len(stations), dtype=int)
+
+        self.priority_key = None
+        self.ready_queues = None  # JobPriorityQueue per node, None: no priority key
+        self.set_priority_key(priority_key)
+
+    def set_priority_key(self, priority_key):
+        self.priority_key = priority_key
+        if priority_key is None:
+            self.ready_queues = None
+        else:
+            self.ready_queues = [JobPriorityQueue(priority_key, ready_set) for ready_set in self.ready_sets]
+
+    def add_ready(self, job, node):
+        if job in self.ready_jobs:
+            return
+        self.ready_jobs.add(job)
+        self.ready_sets[node].add(job)
+        self.ready_count[node] += 1
+        if self.ready_queues is not None:
+            self.ready_queues[node].push(job)
+
+    def remove_ready(self, job, node):
+        if job not in self.ready_jobs:
+            return
+        self.ready_jobs.remove(job)
+        self.ready_sets[node].remove(job)
+        self.ready_count[node] -= 1
+        if self.ready_queues is not None:
+            self.ready_queues[node].remove(job)
+
+    def best_ready(self, node):
+        '''
+        :return: ready job of the node with the smallest priority key, None if there is none
+        '''
+        return self.ready_queues[node].peek()
+
+    def nearest_station(self, pos):
+        '''
+        :return: node of the nearest station with ready jobs, None if there is none
+        '''
+        if len(self.ready_jobs) == 0:
+            return None
+        distances = np.where(self.ready_count > 0, self.layout.get_distances(pos), np.inf)
+        return int(np.argmin(distances))
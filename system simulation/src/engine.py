@@ -0,0 +1,67 @@
+from global_def import *
+import heapq
+
+
+class EventType(enum.IntEnum):
+    JobArrival = 0  # 新Job到达工厂入口
+    MachineFinish = 1  # 机器加工结束
+    RobotArrival = 2  # 机器人到达取货/送货位置
+    Settle = 3  # 同一时刻的后续处理（机器空闲、Job入队后立即分配）
+
+
+class EventEngine:
+    """
+    Next-event engine: drives the same Factory/Workstation/Machine/Robot objects as the
+    fixed-tick backend, but jumps straight from one event to the next.
+    -> Devices report their next state change through Device.schedule_event()
+    -> Factory.update(dt) is called once per event time with the exact elapsed time,
+       so the busy/idle time accounting of every device stays exact
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.factory.event_engine = self
+
+        self.event_queue = []  # heap of (time, seq, event_type, device)
+        self.seq = 0  # tie-breaker, keeps FIFO order for equal times
+        self.num_events = 0
+        self.num_updates = 0
+
+        self.scheduled_arrival_time = None  # time of the JobArrival event in the heap
+
+    def schedule(self, event_time, event_type, device=None):
+        heapq.heappush(self.event_queue, (event_time, self.seq, event_type, device))
+        self.seq += 1
+
+    def schedule_next_arrival(self):
+        # only the next job arrival of the factory's arrival cursor is kept in the heap
+        next_time = self.factory.arrival_cursor.peek_time()
+        if next_time is None or next_time == self.scheduled_arrival_time:
+            return
+        self.schedule(next_time, EventType.JobArrival)
+        self.scheduled_arrival_time = next_time
+
+    def run(self, until=None):
+        factory = self.factory
+        if until is None:
+            until = factory.scenario.total_backend_run_time
+        self.schedule_next_arrival()
+
+        while self.event_queue and self.event_queue[0][0] <= until:
+            event_time = self.event_queue[0][0]
+
+            # pop all the events of this instant
+            while self.event_queue and self.event_queue[0][0] <= event_time + EPS:
+                heapq.heappop(self.event_queue)
+                self.num_events += 1
+
+            factory.update(max(event_time - factory.total_run_time, 0.0))
+            self.num_updates += 1
+            self.schedule_next_arrival()
+
+        # account the quiet time until the end of the run
+        if factory.total_run_time < until:
+            factory.update(until - factory.total_run_time)
+            self.num_updates += 1
+
+        return factory
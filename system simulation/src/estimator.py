@@ -0,0 +1,22 @@
+class TimeAverage:
+    """
+    Running time integral of a piecewise-constant quantity (e.g. a queue length)
+    -> update() is only called when the value changes, mean() is O(1) at any moment
+    """
+
+    def __init__(self, value=0, start_time=0.0):
+        self.value = value  # current value
+        self.area = 0.0  # integral of value up to last_time
+        self.last_time = start_time  # time of the last change
+
+    def update(self, now, value):
+        self.area += self.value * (now - self.last_time)
+        self.last_time = now
+        self.value = value
+
+    def get_area(self, now):
+        # integral of value up to now
+        return self.area + self.value * (now - self.last_time)
+
+    def mean(self, now):
+        return self.get_area(now) / now if now > 0 else 0.0
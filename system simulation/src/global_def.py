@@ -7,8 +7,6 @@ import time
 import random
 from queue import Queue
 
-import pygame
-
 # Global Return
 RTN_OK = 0
 RTN_ERR = -1
@@ -27,12 +25,26 @@ EPS = 1e-6
 ROBOT_POLICY_NAME = 'DEFAULT' # random
 #ROBOT_POLICY_NAME = 'DISTANCE'# the robot will search for the nearest workstation and get a random job from its output
 #ROBOT_POLICY_NAME = 'DISTANCE_NEH'
+#ROBOT_POLICY_NAME = 'DISTANCE_SPT' # nearest station, then its job by a priority key (NEH / SPT / EDD / LWKR)
 
 # Workstation policy
 # DEFAULT: give job to machine in order of increasing index
 WORKSTATION_POLICY_NAME = 'RANDOM'
 #WORKSTATION_POLICY_NAME = 'FIFO' # FIFO
-#WORKSTATION_POLICY_NAME = 'NEH'
+#WORKSTATION_POLICY_NAME = 'NEH'   # longest total process time first
+#WORKSTATION_POLICY_NAME = 'SPT'   # shortest processing time of the current step first
+#WORKSTATION_POLICY_NAME = 'EDD'   # earliest due date first
+#WORKSTATION_POLICY_NAME = 'LWKR'  # least work remaining first
+#WORKSTATION_POLICY_NAME = 'Q_LEARNING_QUEUE'  # Q-learning queue reordering
+
+# Q-learning
+ALPHA = 0.1     # learning rate
+GAMMA = 0.9     # discount factor (per dispatch decision)
+EPSILON = 0.1   # exploration rate
+Q_ACTIONS = ['FIFO', 'SPT', 'LWKR', 'EDD', 'NEH']  # dispatch rule picked at every decision
+Q_QUEUE_LEN_BUCKETS = [2, 3, 5, 9, 17]  # queue length bucket edges
+Q_WORK_BUCKETS = [1, 2, 4, 8, 16]   # queue remaining work bucket edges, unit: hour
+Q_TABLE_PATH = None             # trained Q table checkpoint (.npz), None: start from zeros
 
 # Workstation/machine
 NUM_WORKSTATIONS = 6
@@ -63,12 +75,27 @@ JOB_TIME_MEAN = [
 JOB_GENERATE_SEED = 42
 JOB_GENERATE_PROBABILITY = [0.3, 0.5, 0.2]
 MAX_JOB_NUM = 300
+DUE_DATE_FACTOR = 3  # due date = arrival time + DUE_DATE_FACTOR * total process time
 
 # Timing
 BACKEND_CYCLE_TIME = 5e-1       # unit: second
 TOTAL_BACKEND_RUN_TIME = 3600*10     # unit: second
 
-BACKEND_SPEED_RATIO = 400      # speed up ratio (仿真加速比率)
+BACKEND_SPEED_RATIO = 400      # speed up ratio (仿真加速比率), initial target of the SimClock, math.inf: max speed
+SPEED_RATIO_STEP = 2            # GUI +/- keys multiply / divide the speed ratio by this
+SPEED_RATIO_MIN = 1             # slowest speed reachable with the GUI keys
+SIM_CLOCK_MAX_LAG = 1.0         # wall seconds behind schedule before the SimClock stops catching up
+SIM_CLOCK_WINDOW = 1.0          # wall seconds the achieved speed ratio is measured over
+SIM_CLOCK_IDLE_TIME = 5e-2      # sleep while the simulation is paused, unit: second
+
+# Scenario: the factory/job/timing values above form scenario.DEFAULT_SCENARIO
+SCENARIO_PATH = None            # scenario file (.json / .toml / .yaml) for main.py, None: the values above
+
+# Trace (queue length log)
+TRACE_PATH = None               # output file, None: no trace
+TRACE_MODE = 'change'           # 'change': sample on queue length change, 'period': every TRACE_PERIOD
+TRACE_PERIOD = 60               # unit: second
+TRACE_BUFFER_SIZE = 65536       # samples kept in memory before a bulk write
 
 ''' ------------------------------------------------------------------------------- '''
 ''' GUI/Frontend 前端界面 '''
@@ -76,6 +103,16 @@ BACKEND_SPEED_RATIO = 400      # speed up ratio (仿真加速比率)
 
 # Timing
 FRONTEND_CYCLE_TIME = 5e-2      # unit: second
+SNAPSHOT_RATE = 30              # backend state snapshots published to the GUI per second (wall clock)
+
+# Backend/GUI split for main.py
+# 'thread': backend thread, GUI thread draws the published snapshots
+# 'process': backend process, state handed over in a shared memory ring (shared_state.py)
+GUI_BACKEND_MODE = 'thread'
+SHARED_RING_SIZE = 4            # frames in the shared memory ring
+SHARED_QUEUE_CAPACITY = 32      # output queue job names per workstation kept in a frame
+SHARED_NAME_SIZE = 12           # bytes per device / job name in a frame
+SHARED_READ_RETRIES = 5         # reads of the newest frame before keeping the previous snapshot
 
 # Window/screen
 WORLD_WIDTH = 900       # real-world bounds, unit: feet
@@ -91,6 +128,8 @@ def map_to_screen(pos):
     return screen_x, screen_y
 
 ROBOT_DIAMETER = 40     # robot size, for display only, unit: pixel
+MAX_JOB_TO_SHOW = 10    # alive jobs listed in the side panel
+MAX_ROBOT_TO_SHOW = 10  # robots listed in the side panel
 STATION_WIDTH = 40     # station width, for display only, unit: pixel
 
 # Colors
@@ -106,3 +145,4 @@ COLOR_ORANGE = (255, 165, 0)  # Orange for output and occupied
 # Fonts
 FONT_FAMILY = 'consolas'
 FONT_SIZE = 18
+TEXT_CACHE_SIZE = 4096  # rendered text surfaces kept in the LRU cache (render.py)
@@ -1,38 +1,85 @@
 from global_def import *
+from render import *
+from sim_clock import get_speed_text
 import pygame
 
 
 class GraphicUserInterface:
-    def __init__(self, factory):
+    def __init__(self, factory, snapshots=None):
+        '''
+        :param factory: Factory, only used without snapshots (None: the backend runs in another process)
+        :param snapshots: SnapshotBuffer the backend publishes to, or the SharedStateReader of a backend process,
+                          None: the GUI takes the snapshots of the factory itself (only safe if nothing else updates it)
+        '''
         pygame.init()
 
         self.factory = factory
+        self.snapshots = snapshots
+        self.snapshot_version = None  # version of the snapshot on screen
 
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption(f"Factory Simulator (Speed x{BACKEND_SPEED_RATIO})")
 
+        # target speed of the backend SimClock, changed with the keys (see handle_key)
+        self.speed_ratio = BACKEND_SPEED_RATIO
+        # last finite target, restored when leaving MAX
+        self.finite_speed_ratio = BACKEND_SPEED_RATIO if not math.isinf(BACKEND_SPEED_RATIO) else SPEED_RATIO_MIN
+        pygame.display.set_caption(f"Factory Simulator (Speed x{get_speed_text(self.speed_ratio)})")
 
-        # Define fonts
-        self.font = pygame.font.SysFont(FONT_FAMILY, FONT_SIZE)
+        # Define fonts (shared registry, created once now that pygame is initialized)
+        self.font = FONTS.get()
 
         self.clock = pygame.time.Clock()
         self.running = False
 
         self.paused = False
 
+        # dirty-region drawing: only what changed since the last frame is repainted and pushed to the display
+        self.scene = Scene(self.screen)
+        self.needs_redraw = True  # draw even while paused (pause toggled, window exposed)
+
     def draw_status(self):
         # Draw a status indicator on the screen showing whether the system is paused
         color = (200, 0, 0) if self.paused else (0, 200, 0)
-        font = pygame.font.SysFont(None, 50)
-        status_text = "Paused" if self.paused else f"Running (X{BACKEND_SPEED_RATIO})"
-        label = font.render(status_text, True, color)
-        self.screen.blit(label, (SCREEN_WIDTH - 600, SCREEN_HEIGHT - 95))
-        pass
+        if self.paused:
+            status_text = "Paused"
+        else:
+            # target speed, and the speed the backend really reaches
+            achieved_ratio = self.snapshots.achieved_ratio if self.snapshots is not None else math.nan
+            status_text = f"Running (X{get_speed_text(self.speed_ratio)})"
+            if not math.isnan(achieved_ratio):
+                status_text += f" X{achieved_ratio:.0f}"
+        label = TEXT_CACHE.render(status_text, color=color, size=50, family=None)
+        label_pos = (SCREEN_WIDTH - 600, SCREEN_HEIGHT - 95)
+        draw_item(self.scene, 'status', (status_text, color), label.get_rect(topleft=label_pos),
+                  lambda surface: surface.blit(label, label_pos))
 
     def handle_screen_click(self):
         # Toggle pause/resume when the screen is clicked
         self.paused = not self.paused
-        self.factory.is_paused = self.paused  # Update the global pause flag
+        if self.snapshots is None:
+            self.factory.is_paused = self.paused  # Update the global pause flag
+        else:
+            self.snapshots.request_pause(self.paused)  # applied by the backend before its next update
+
+    def handle_key(self, key):
+        # Speed control: +/UP faster, -/DOWN slower (by SPEED_RATIO_STEP), M toggles max speed
+        if key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_UP):
+            self.finite_speed_ratio *= SPEED_RATIO_STEP
+            self.set_speed(self.finite_speed_ratio)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS, pygame.K_DOWN):
+            self.finite_speed_ratio = max(self.finite_speed_ratio / SPEED_RATIO_STEP, SPEED_RATIO_MIN)
+            self.set_speed(self.finite_speed_ratio)
+        elif key == pygame.K_m:
+            self.set_speed(self.finite_speed_ratio if math.isinf(self.speed_ratio) else math.inf)
+
+    def set_speed(self, speed_ratio):
+        '''
+        :param speed_ratio: simulated seconds per wall second, math.inf: max speed
+        '''
+        self.speed_ratio = speed_ratio
+        if self.snapshots is not None:
+            self.snapshots.request_speed(speed_ratio)  # picked up by the backend SimClock
+        pygame.display.set_caption(f"Factory Simulator (Speed x{get_speed_text(speed_ratio)})")
 
     def run(self):
         self.running = True
@@ -45,24 +92,43 @@ class GraphicUserInterface:
                     self.running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_screen_click()  # Handle click anywhere on the screen
-
-            # Clear screen
-            self.screen.fill(COLOR_LIGHT_GREY)
-
-
-            # update the factory
-            self.factory.draw(self.screen)
-
-            # Draw current status (Paused/Running)
-            self.draw_status()
-
-            # Update the display
-            pygame.display.flip()
+                    self.needs_redraw = True
+                elif event.type == pygame.KEYDOWN:
+                    self.handle_key(event.key)
+                    self.needs_redraw = True
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.scene.invalidate()
+                    self.needs_redraw = True
+
+            # the GUI draws only from immutable snapshots, never from the live factory
+            if self.snapshots is None:
+                snapshot, version = self.factory.snapshot(), self.factory.total_run_time
+            else:
+                snapshot, version = self.snapshots.latest, self.snapshots.version
+
+            # nothing new to show (paused, no snapshot published since the last frame): skip the frame
+            if snapshot is not None and ((version != self.snapshot_version and not self.paused)
+                                         or self.needs_redraw):
+                self.needs_redraw = False
+                self.snapshot_version = version
+                self.scene.begin()
+
+                # draw the factory
+                snapshot.draw(self.scene)
+
+                # Draw current status (Paused/Running)
+                self.draw_status()
+
+                # Update the display, only the regions that changed
+                dirty_rects = self.scene.end()
+                if dirty_rects:
+                    pygame.display.update(dirty_rects)
 
             # Cap the frame rate
             self.clock.tick(int(1 / FRONTEND_CYCLE_TIME))
 
     def stop(self):
         pygame.quit()
+        clear_render_cache()
 
         # TODO: logging and saving status
@@ -0,0 +1,196 @@
+'''
+Headless batch runner: runs the backend as fast as the CPU allows
+-> no pygame / gui.py, no thread, no sleep
+-> usage: python headless.py --until 36000 --seed 42 --robot-policy DISTANCE [--scenario scenarios/default.toml]
+'''
+import argparse
+from dataclasses import dataclass, field, asdict, replace
+
+from global_def import *
+from device import *
+from engine import *
+
+
+@dataclass
+class RunConfig:
+    seed: int = JOB_GENERATE_SEED
+    scenario: Scenario = DEFAULT_SCENARIO
+    robot_policy: str = None  # None: the scenario's (same for max_job_num / job_arrival_rate)
+    workstation_policy: str = None
+    max_job_num: int = None
+    job_arrival_rate: float = None
+    engine: str = 'event'  # 'event': next-event engine, 'tick': fixed BACKEND_CYCLE_TIME steps
+    trace_path: str = TRACE_PATH  # queue length trace file, None: no trace
+    trace_mode: str = TRACE_MODE
+    trace_period: float = TRACE_PERIOD
+    q_table_path: str = Q_TABLE_PATH  # Q table checkpoint for Q_LEARNING_QUEUE, run frozen and greedy
+
+    def resolve(self):
+        # copy with the per-run overrides applied to the scenario and every None filled from it
+        scenario = self.scenario
+        overrides = dict(robot_policy=self.robot_policy, workstation_policy=self.workstation_policy,
+                         max_job_num=self.max_job_num, job_arrival_rate=self.job_arrival_rate)
+        scenario = scenario.replace(**{key: value for key, value in overrides.items() if value is not None})
+        return replace(self, scenario=scenario, **{key: getattr(scenario, key) for key in overrides})
+
+
+@dataclass
+class RunResult:
+    config: RunConfig
+    sim_time: float  # simulated time, unit: second
+    wall_time: float  # real time spent, unit: second
+    total_input_job: int
+    total_output_job: int
+    throughput: float  # finished jobs per hour
+    mean_job_time: float  # mean Job.total_busy_time of the finished jobs, unit: second
+    robot_utilization: list = field(default_factory=list)
+    machine_utilization: list = field(default_factory=list)  # per workstation, [[M1, M2, ...], ...]
+    workstation_utilization: list = field(default_factory=list)
+    workstation_lq: list = field(default_factory=list)  # time-average input queue length
+    workstation_wq: list = field(default_factory=list)  # average input queue waiting time, unit: second
+    workstation_l: list = field(default_factory=list)  # time-average jobs queueing or in process
+    workstation_w: list = field(default_factory=list)  # average time queueing or in process, unit: second
+    factory_lq: float = 0.0  # entry queue
+    factory_wq: float = 0.0
+    factory_l: float = 0.0  # jobs in the factory
+    factory_w: float = 0.0  # time in the factory, unit: second
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def build_factory(config):
+    config = config.resolve()
+    scenario = config.scenario
+    factory = Factory(name='Entry', scenario=scenario)
+
+    job_times, jobs = generate_all_jobs(seed=config.seed, scenario=scenario)
+    factory.set_jobs(job_times, jobs)
+
+    if config.q_table_path is not None:
+        factory.q_table = QTable.load(config.q_table_path)
+        factory.q_table.alpha = 0.0
+        factory.q_table.epsilon = 0.0
+
+    if config.trace_path is not None:
+        factory.trace = TraceWriter(config.trace_path, mode=config.trace_mode, period=config.trace_period,
+                                    metadata=dict(asdict(config),
+                                                  num_machines_workstation=list(scenario.num_machines_workstation),
+                                                  num_robots=scenario.num_robots))
+    return factory
+
+
+def collect_result(factory, config, wall_time):
+    for workstation in factory.workstations:
+        workstation.sync_machines()
+    finished_times = factory.jobs.get_busy_times()
+    sim_time = factory.total_run_time
+
+    return RunResult(
+        config=config,
+        sim_time=sim_time,
+        wall_time=wall_time,
+        total_input_job=factory.total_input_job,
+        total_output_job=factory.total_output_job,
+        throughput=factory.total_output_job / sim_time * 3600 if sim_time > 0 else 0.0,
+        mean_job_time=float(np.mean(finished_times)) if len(finished_times) > 0 else float('nan'),
+        robot_utilization=[float(robot.time_utilization) for robot in factory.robots],
+        machine_utilization=[[float(machine.time_utilization) for machine in workstation.machines]
+                             for workstation in factory.workstations],
+        workstation_utilization=[float(workstation.time_utilization) for workstation in factory.workstations],
+        workstation_lq=[float(workstation.get_lq()) for workstation in factory.workstations],
+        workstation_wq=[float(workstation.get_wq()) for workstation in factory.workstations],
+        workstation_l=[float(workstation.get_l()) for workstation in factory.workstations],
+        workstation_w=[float(workstation.get_w()) for workstation in factory.workstations],
+        factory_lq=float(factory.get_lq()),
+        factory_wq=float(factory.get_wq()),
+        factory_l=float(factory.get_l()),
+        factory_w=float(factory.get_w()),
+    )
+
+
+def run_headless(config=None, until=None, q_table=None):
+    '''
+    Build a Factory from the config and run it until the given simulated time
+    :param config: RunConfig, None for the default scenario
+    :param until: simulated run time, unit: second, None for scenario.total_backend_run_time
+    :param q_table: QTable used (and updated) by Q_LEARNING_QUEUE, overrides config.q_table_path
+    :return: RunResult
+    '''
+    if config is None:
+        config = RunConfig()
+    config = config.resolve()
+    if until is None:
+        until = config.scenario.total_backend_run_time
+
+    factory = build_factory(config)
+    if q_table is not None:
+        factory.q_table = q_table
+    start_time = time.perf_counter()
+
+    if config.engine == 'event':
+        EventEngine(factory).run(until)
+    elif config.engine == 'tick':
+        while factory.total_run_time < until:
+            factory.update(config.scenario.backend_cycle_time)
+    else:
+        raise ValueError(f'ENGINE {config.engine} not recognized')
+    factory.end_run()
+
+    if factory.trace is not None:
+        # arrival counts for post-processing the queue series (Little's Law)
+        factory.trace.metadata['sim_time'] = factory.total_run_time
+        factory.trace.metadata['workstation_input_job'] = [ws.total_input_job for ws in factory.workstations]
+        factory.trace.close()
+
+    return collect_result(factory, config, time.perf_counter() - start_time)
+
+
+def print_result(result):
+    print(f'Simulated {seconds_to_hhmmss(result.sim_time)} in {result.wall_time:.2f} s '
+          f'(scenario {result.config.scenario.name}, seed {result.config.seed}, robot {result.config.robot_policy}, '
+          f'workstation {result.config.workstation_policy}, engine {result.config.engine})')
+    print(f'  Jobs in/out: {result.total_input_job}/{result.total_output_job}, '
+          f'throughput: {result.throughput:.1f} /h, mean job time: {result.mean_job_time:.1f} s')
+    print(f'  Robot util: {[round(util, 3) for util in result.robot_utilization]}')
+    print(f'  Workstation util: {[round(util, 3) for util in result.workstation_utilization]}')
+    print(f'  Workstation LQ: {[round(lq, 2) for lq in result.workstation_lq]}')
+    print(f'  Workstation WQ: {[round(wq, 1) for wq in result.workstation_wq]}')
+    print(f'  Entry LQ: {result.factory_lq:.2f}, WQ: {result.factory_wq:.1f} s, '
+          f'L: {result.factory_l:.2f}, W: {result.factory_w:.1f} s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the factory backend headless (no GUI, no sleep).')
+    parser.add_argument('--scenario', default=None, help='scenario file (.json / .toml / .yaml)')
+    parser.add_argument('--until', type=float, default=None, help='simulated time, unit: second')
+    parser.add_argument('--seed', type=int, default=JOB_GENERATE_SEED)
+    parser.add_argument('--robot-policy', default=None)
+    parser.add_argument('--workstation-policy', default=None)
+    parser.add_argument('--max-jobs', type=int, default=None)
+    parser.add_argument('--arrival-rate', type=float, default=None, help='jobs per second')
+    parser.add_argument('--engine', choices=['event', 'tick'], default='event')
+    parser.add_argument('--trace', default=TRACE_PATH, help='queue length trace file')
+    parser.add_argument('--trace-mode', choices=['change', 'period'], default=TRACE_MODE)
+    parser.add_argument('--trace-period', type=float, default=TRACE_PERIOD, help='unit: second')
+    parser.add_argument('--q-table', default=Q_TABLE_PATH, help='Q table checkpoint for Q_LEARNING_QUEUE')
+    args = parser.parse_args(argv)
+
+    config = RunConfig(seed=args.seed,
+                       scenario=load_scenario(args.scenario) if args.scenario else DEFAULT_SCENARIO,
+                       robot_policy=args.robot_policy,
+                       workstation_policy=args.workstation_policy,
+                       max_job_num=args.max_jobs,
+                       job_arrival_rate=args.arrival_rate,
+                       engine=args.engine,
+                       trace_path=args.trace,
+                       trace_mode=args.trace_mode,
+                       trace_period=args.trace_period,
+                       q_table_path=args.q_table)
+    result = run_headless(config, until=args.until)
+    print_result(result)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
-from win32comext.shell.demos.servers.folder_view import tasks
-from xlwings.mistune.plugins.task_lists import task_lists_hook
-
 from global_def import *
+from layout import *
+from scenario import *
 
 
 # 作业类，表示一个生产任务/工单状态
@@ -16,110 +15,252 @@ class JobState(enum.Enum):
     Perished = 6  # 完成
 
 
+JOB_STATES = tuple(JobState)  # state code -> JobState
+
+
 class Job:
-    def __init__(self, parent, index, name, job_type):
-        self.parent = parent
-        self.index = index
-        self.name = name
-        self.type = job_type  # start from 0
-        self.arrival_time = 0
-        self.interarrival_time = 0
+    """
+    Thin view over one row of a JobStore
+    -> holds only (store, index), every attribute is read from / written to the store arrays
+    -> views of the same row compare and hash equal
+    """
+
+    __slots__ = ('store', 'index')
 
-        # Job routing
-        self.routing_list = JOB_ROUTING[self.type]  # 路线列表，如 [3, 1, 2, 5]
-        self.routing_workstation_list = []
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
 
-        # Calculate the job service time (Sample from the gamma distribution)
-        self.service_time_list = [np.random.gamma(shape=JOB_TIME_GAMMA,
-                                                  scale=JOB_TIME_MEAN[self.type][i_routine] / JOB_TIME_GAMMA)
-                                  for i_routine in range(len(self.routing_list))]
+    def __eq__(self, other):
+        return isinstance(other, Job) and self.index == other.index and self.store is other.store
+
+    def __hash__(self):
+        return self.index
+
+    def __repr__(self):
+        return f'Job({self.name})'
+
+    @property
+    def parent(self):
+        return self.store.parent
+
+    @property
+    def name(self):
+        return f'J{self.index + 1}'
+
+    @property
+    def type(self):
+        # start from 0
+        return int(self.store.types[self.index])
+
+    @property
+    def arrival_time(self):
+        return float(self.store.arrival_times[self.index])
+
+    @property
+    def interarrival_time(self):
+        if self.index == 0:
+            return self.arrival_time
+        return float(self.store.arrival_times[self.index] - self.store.arrival_times[self.index - 1])
+
+    # Job routing
+    @property
+    def routing_list(self):
+        return self.store.scenario.job_routing[self.type]  # 路线列表，如 (3, 1, 2, 5)
+
+    @property
+    def routing_workstation_list(self):
+        return [self.parent.workstations[i_ws - 1] for i_ws in self.routing_list]
+
+    @property
+    def service_time_list(self):
+        offset = self.store.service_offsets[self.index]
+        return self.store.service_times[offset:self.store.service_offsets[self.index + 1]]
+
+    @property
+    def total_service_time(self):
+        return float(self.store.total_service_times[self.index])
+
+    @property
+    def total_transport_time(self):
+        return self.store.transport_times[self.store.types[self.index]]
+
+    @property
+    def total_process_time(self):
+        return self.total_transport_time + self.total_service_time
+
+    @property
+    def remaining_service_time(self):
+        # service time of the current and all later routing steps
+        return float(self.service_time_list[self.curr_routing_index:].sum())
+
+    @property
+    def due_date(self):
+        return self.arrival_time + self.store.scenario.due_date_factor * self.total_process_time
+
+    # Current state
+    @property
+    def state(self):
+        return JOB_STATES[self.store.states[self.index]]
+
+    @state.setter
+    def state(self, state):
+        self.store.states[self.index] = state.value
+
+    @property
+    def curr_routing_index(self):
+        # 当前正在处理的ROUTING索引
+        return int(self.store.routing_indices[self.index])
+
+    @curr_routing_index.setter
+    def curr_routing_index(self, routing_index):
+        self.store.routing_indices[self.index] = routing_index
+
+    @property
+    def curr_workstation(self):
+        node = self.store.curr_nodes[self.index]
+        return None if node < 0 else self.parent.stations[node]
+
+    @curr_workstation.setter
+    def curr_workstation(self, station):
+        self.store.curr_nodes[self.index] = station.node
+
+    @property
+    def next_workstation(self):
+        if self.curr_routing_index == len(self.routing_list):
+            return self.parent  # return to factory
+        return self.parent.workstations[self.routing_list[self.curr_routing_index] - 1]
 
-        self.total_service_time = sum(self.service_time_list)
+    @property
+    def start_time(self):
+        start_time = self.store.start_times[self.index]
+        return None if np.isnan(start_time) else float(start_time)
 
-        self.total_transport_time = self.cal_total_transport() / ROBOT_SPEED
+    @start_time.setter
+    def start_time(self, start_time):
+        self.store.start_times[self.index] = start_time
 
-        self.total_process_time = self.total_transport_time + self.total_service_time
-        # Current state
-        self.state = JobState.NotExist
-        self.pos = (0, 0)
+    @property
+    def end_time(self):
+        end_time = self.store.end_times[self.index]
+        return None if np.isnan(end_time) else float(end_time)
 
-        self.curr_routing_index = 0  # 当前正在处理的ROUTING索引
-        self.curr_workstation = None
-        self.next_workstation = None
+    @end_time.setter
+    def end_time(self, end_time):
+        self.store.end_times[self.index] = end_time
 
-        self.start_time = None
-        self.end_time = None
-        self.total_busy_time = None
+    @property
+    def total_busy_time(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
 
     def cal_total_transport(self):
-        total_dis = 0
-        for i in range(len(self.routing_list) + 1):
-            if i == 0:
-                total_dis += self.calculate_distance(FACTORY_POS, WORKSTATION_POS[self.routing_list[i] - 1])[2]
-                continue
-            elif i == len(self.routing_list):
-                total_dis += self.calculate_distance(FACTORY_POS, WORKSTATION_POS[self.routing_list[i - 1] - 1])[2]
-                continue
-            total_dis += self.calculate_distance(WORKSTATION_POS[self.routing_list[i - 1] - 1],
-                                                 WORKSTATION_POS[self.routing_list[i] - 1])[2]
-
-        return total_dis
-
-    def calculate_distance(self, pos_start, pos_end):
-        """Calculate Euclidean distance between two points (x1, y1) and (x2, y2)."""
-        return (pos_end[0] - pos_start[0],
-                pos_end[1] - pos_start[1],
-                ((pos_end[0] - pos_start[0]) ** 2 + (pos_end[1] - pos_start[1]) ** 2) ** 0.5)
+        # entry -> routing -> entry, from the shared layout distance matrix
+        return self.store.scenario.layout.route_distance(self.routing_list)
 
     def next_routing(self):
         '''
-        当JOB离开当前Station时调用
+        当JOB离开当前Station时调用，next_workstation 随 curr_routing_index 更新
         :return:
         '''
-        # self.duration = time.time() - self.start_time
         self.curr_routing_index += 1
 
-        # Proceed job to its next target
-        if self.curr_routing_index == len(self.routing_list):
-            self.next_workstation = self.parent  # return to factory
-        else:
-            self.next_workstation = self.routing_workstation_list[self.curr_routing_index]
 
+def _index_dtype(max_value):
+    # smallest signed integer type holding -1 .. max_value
+    return np.min_scalar_type(-max_value - 1)
+
+
+class JobStore:
+    """
+    Structure-of-arrays storage of all jobs of a run
+    -> one NumPy array per job attribute, service times flattened and indexed by service_offsets
+    -> store[i] returns a Job view of row i, end-of-run statistics are array reductions
+    """
+
+    def __init__(self, arrival_times, types, service_times, service_offsets, scenario=DEFAULT_SCENARIO):
+        num_jobs = len(types)
+        self.parent = None  # Factory, set by Factory.set_jobs
+        self.scenario = scenario  # routing, due dates and transport times of the job types
+
+        self.arrival_times = np.asarray(arrival_times, dtype=float)  # [N]
+        self.types = np.asarray(types, dtype=_index_dtype(scenario.num_job_types))  # [N], start from 0
+        self.service_times = np.asarray(service_times, dtype=float)  # [sum of routing lengths]
+        self.service_offsets = np.asarray(service_offsets, dtype=np.int64)  # [N + 1], row i: offsets[i]:offsets[i+1]
+        self.total_service_times = np.add.reduceat(self.service_times, self.service_offsets[:-1]) \
+            if num_jobs > 0 else np.zeros(0)
+        self.transport_times = np.array([scenario.layout.route_distance(routing) / scenario.robot_speed
+                                         for routing in scenario.job_routing])  # per job type
 
-def generate_all_jobs(max_job_num, job_arrival_rate, seed=42):
-    # Set the seed for reproducibility
+        self.states = np.full(num_jobs, JobState.NotExist.value, dtype=np.int8)
+        max_routing_len = max((len(routing) for routing in scenario.job_routing), default=0)
+        self.routing_indices = np.zeros(num_jobs, dtype=_index_dtype(max_routing_len))
+        self.curr_nodes = np.full(num_jobs, -1, dtype=_index_dtype(scenario.num_workstations))  # station node, -1: none
+        self.start_times = np.full(num_jobs, np.nan)
+        self.end_times = np.full(num_jobs, np.nan)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        return Job(self, index)
+
+    @property
+    def interarrival_times(self):
+        return np.diff(self.arrival_times, prepend=0.0)
+
+    def get_alive_mask(self):
+        # jobs that have arrived and are not finished
+        return (self.states != JobState.NotExist.value) & (self.states != JobState.Perished.value)
+
+    def get_busy_times(self):
+        # total busy time of every finished job
+        finished = ~np.isnan(self.end_times)
+        return self.end_times[finished] - self.start_times[finished]
+
+
+def generate_all_jobs(max_job_num=None, job_arrival_rate=None, seed=42, scenario=DEFAULT_SCENARIO):
+    '''
+    Sample all interarrival times, job types and service times in a few batched draws
+    :param max_job_num: None for scenario.max_job_num
+    :param job_arrival_rate: jobs per second, None for scenario.job_arrival_rate
+    :param scenario: Scenario of the job types (routing, service time means, type probabilities)
+    :return: (arrival times, JobStore), the arrival times are the store's own array (sorted, not a copy)
+    '''
+    if max_job_num is None:
+        max_job_num = scenario.max_job_num
+    if job_arrival_rate is None:
+        job_arrival_rate = scenario.job_arrival_rate
+
+    # Per-run generator for the job data; the global generators are seeded for the policies
+    rng = np.random.default_rng(seed)
     np.random.seed(seed)
     random.seed(seed)
 
     # Mean interarrival time based on job arrival rate
     mean_interarrival_time = 1 / job_arrival_rate
 
-    time_list = []
-    job_list = []
-
-    current_time = 0
-    # Generate jobs
-    for i in range(max_job_num):
-        # Generate the interarrival time using an exponential distribution
-        interarrival_time = np.random.exponential(mean_interarrival_time)
-
-        # Update the current time with the interarrival time
-        current_time += interarrival_time
+    # Generate the interarrival time using an exponential distribution
+    interarrival_times = rng.exponential(mean_interarrival_time, size=max_job_num)
+    arrival_times = np.cumsum(interarrival_times)
 
-        # Randomly assign a job type based on the given probabilities
-        job_type = random.choices(
-            population=range(NUM_JOB_TYPES),  # 任务类型的列表
-            weights=JOB_GENERATE_PROBABILITY  # 从job_types中提取生成概率
-        )[0]
-        new_job = Job(parent=None, index=i,
-                      name=f'J{i + 1}', job_type=job_type)
-        new_job.arrival_time = current_time
-        new_job.interarrival_time = interarrival_time
+    # Randomly assign a job type based on the given probabilities
+    types = rng.choice(scenario.num_job_types, size=max_job_num, p=scenario.job_generate_probability)
 
-        time_list.append(current_time)
-        job_list.append(new_job)
+    # Service time of every routing step (flattened), gamma distributed around job_time_mean
+    routing_lens = np.array([len(routing) for routing in scenario.job_routing])[types]
+    service_offsets = np.concatenate(([0], np.cumsum(routing_lens)))
+    i_steps = np.arange(service_offsets[-1]) - np.repeat(service_offsets[:-1], routing_lens)
+    max_routing_len = max(len(routing) for routing in scenario.job_routing)
+    time_mean = np.zeros((scenario.num_job_types, max_routing_len))
+    for i_type, type_time_mean in enumerate(scenario.job_time_mean):
+        time_mean[i_type, :len(type_time_mean)] = type_time_mean
+    service_times = rng.gamma(shape=scenario.job_time_gamma,
+                              scale=time_mean[np.repeat(types, routing_lens), i_steps] / scenario.job_time_gamma)
 
-    return time_list, job_list
+    job_store = JobStore(arrival_times, types, service_times, service_offsets, scenario)
+    return job_store.arrival_times, job_store
 
 
 if __name__ == '__main__':
@@ -224,7 +365,7 @@ if __name__ == '__main__':
     ----------> Histogram of Interarrival Time
     '''
     # Extract interarrival_time values
-    interarrival_times = [job.interarrival_time for job in g_jobs]
+    interarrival_times = g_jobs.interarrival_times
     print(f'interarrival_times mean: {np.mean(interarrival_times)}')
     print(f'interarrival_times median: {np.median(interarrival_times)}')
     print(f'interarrival_times std: {np.std(interarrival_times)}')
@@ -250,8 +391,8 @@ if __name__ == '__main__':
     '''
 
     # Extract interarrival_time values
-    job_id = [job.index + 1 for job in g_jobs]
-    arrive_time = [job.arrival_time for job in g_jobs]
+    job_id = np.arange(len(g_jobs)) + 1
+    arrive_time = g_jobs.arrival_times
     print(f'arrive_time mean: {np.mean(arrive_time)}')
 
 
@@ -331,7 +472,7 @@ if __name__ == '__main__':
     from collections import Counter
     
     # Step 1: Extract job types from the job_list
-    job_types = [job.type for job in g_jobs]
+    job_types = g_jobs.types.tolist()
 
     # Step 2: Count the occurrences of each type
     type_counts = Counter(job_types)
@@ -363,7 +504,7 @@ if __name__ == '__main__':
     '''
 
     # Step 1: Extract job types from the job_list
-    job_types = [job.type for job in g_jobs]
+    job_types = g_jobs.types.tolist()
 
     # Step 2: Count the observed frequencies for each job type
     observed_frequencies = Counter(job_types)
@@ -402,11 +543,11 @@ if __name__ == '__main__':
     shape_parameter = 2  # Given shape parameter for the Gamma distribution
 
     # Step 1: Filter job list for job.type == 1
-    job_type_1_list = [job for job in g_jobs if job.type == 1]
+    job_type_1_list = np.flatnonzero(g_jobs.types == 1)
 
     # Step 2: Simulate the service times using the Gamma distribution
     # the second in the list (which is the
-    service_times = [job.service_time_list[1] for job in job_type_1_list]
+    service_times = g_jobs.service_times[g_jobs.service_offsets[job_type_1_list] + 1]
     expected_service_times = 3600 * 0.2
 
     print('service time mean:', np.mean(service_times))
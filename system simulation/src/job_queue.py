@@ -0,0 +1,264 @@
+from global_def import *
+from collections import deque
+import heapq
+
+# Job queues share a small interface: append(job), pop() -> next job by the queue's rule,
+# remove(job), len(), `in`, iteration. All operations are O(1) (amortized) or O(log n).
+
+
+class JobFifoQueue:
+    """
+    First-in first-out queue of jobs with O(1) append / pop and O(1) removal of any job
+    -> entries live in a deque, remove() only marks the entry, pop() skips marked entries
+    """
+
+    def __init__(self, jobs=()):
+        self.entries = deque()  # [job], job is None once removed
+        self.position = {}  # job -> its entry
+        for job in jobs:
+            self.append(job)
+
+    def append(self, job):
+        if job in self.position:
+            return
+        entry = [job]
+        self.position[job] = entry
+        self.entries.append(entry)
+
+    def remove(self, job):
+        self.position.pop(job)[0] = None
+        # drop the marked entries once they outnumber the live ones
+        if len(self.entries) > 2 * len(self.position) + 32:
+            self.entries = deque(entry for entry in self.entries if entry[0] is not None)
+
+    def discard(self, job):
+        if job in self.position:
+            self.remove(job)
+
+    def peek(self):
+        '''
+        :return: the oldest job, None if empty
+        '''
+        while self.entries and self.entries[0][0] is None:
+            self.entries.popleft()
+        return self.entries[0][0] if self.entries else None
+
+    def pop(self):
+        job = self.peek()
+        if job is None:
+            raise IndexError('pop from an empty JobFifoQueue')
+        self.entries.popleft()
+        del self.position[job]
+        return job
+
+    def __len__(self):
+        return len(self.position)
+
+    def __contains__(self, job):
+        return job in self.position
+
+    def __iter__(self):
+        return (entry[0] for entry in self.entries if entry[0] is not None)
+
+
+class JobSet:
+    """
+    Unordered set of jobs with O(1) add/remove and O(1) uniform random choice
+    -> jobs are kept in a list, removal swaps the last job into the freed slot
+    """
+
+    def __init__(self, jobs=()):
+        self.jobs = []
+        self.position = {}  # job -> index in self.jobs
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job):
+        if job in self.position:
+            return
+        self.position[job] = len(self.jobs)
+        self.jobs.append(job)
+
+    append = add  # queue interface
+
+    def remove(self, job):
+        i_job = self.position.pop(job)
+        last_job = self.jobs.pop()
+        if last_job != job:
+            self.jobs[i_job] = last_job
+            self.position[last_job] = i_job
+
+    def discard(self, job):
+        if job in self.position:
+            self.remove(job)
+
+    def choice(self):
+        return random.choice(self.jobs)
+
+    def pop(self):
+        # remove and return a uniformly random job
+        job = self.choice()
+        self.remove(job)
+        return job
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, job):
+        return job in self.position
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+
+class JobPriorityQueue:
+    """
+    Jobs ordered by key(job), smallest key first, O(log n) push / pop
+    -> remove() only marks the heap entry, it is dropped once it reaches the top (lazy deletion)
+    -> jobs with equal keys come out in insertion order
+    """
+
+    def __init__(self, key, jobs=()):
+        self.key = key
+        self.heap = []  # [priority, seq, job], job is None once removed
+        self.entries = {}  # job -> its heap entry
+        self.seq = 0
+        for job in jobs:
+            self.push(job)
+
+    def push(self, job):
+        if job in self.entries:
+            return
+        entry = [self.key(job), self.seq, job]
+        self.seq += 1
+        self.entries[job] = entry
+        heapq.heappush(self.heap, entry)
+
+    append = push  # list-like insert for Device.add_job
+
+    def remove(self, job):
+        entry = self.entries.pop(job)
+        entry[-1] = None
+        # rebuild once most of the heap is removed entries
+        if len(self.heap) > 2 * len(self.entries) + 32:
+            self.heap = [entry for entry in self.heap if entry[-1] is not None]
+            heapq.heapify(self.heap)
+
+    def discard(self, job):
+        if job in self.entries:
+            self.remove(job)
+
+    def peek(self):
+        '''
+        :return: the job with the smallest key, None if empty
+        '''
+        while self.heap and self.heap[0][-1] is None:
+            heapq.heappop(self.heap)
+        return self.heap[0][-1] if self.heap else None
+
+    def pop(self):
+        job = self.peek()
+        if job is None:
+            raise IndexError('pop from an empty JobPriorityQueue')
+        heapq.heappop(self.heap)
+        del self.entries[job]
+        return job
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, job):
+        return job in self.entries
+
+    def __iter__(self):
+        # insertion order, not priority order
+        return iter(self.entries)
+
+
+def neh_key(job):
+    # longest total process time first
+    return -job.total_process_time
+
+
+def spt_key(job):
+    # shortest processing time of the current routing step first (jobs returning to the entry: 0)
+    if job.curr_routing_index < len(job.routing_list):
+        return job.service_time_list[job.curr_routing_index]
+    return 0.0
+
+
+def edd_key(job):
+    # earliest due date first
+    return job.due_date
+
+
+def lwkr_key(job):
+    # least work remaining first
+    return job.remaining_service_time
+
+
+PRIORITY_KEYS = {
+    'NEH': neh_key,
+    'SPT': spt_key,
+    'EDD': edd_key,
+    'LWKR': lwkr_key,
+}
+
+
+class JobRuleQueue:
+    """
+    Queue that can hand out its next job by any of several rules (FIFO or a PRIORITY_KEYS name)
+    -> one JobFifoQueue plus one JobPriorityQueue per key, pop() uses the current rule
+    -> also keeps the total remaining service time of the queued jobs
+    """
+
+    def __init__(self, key_names, jobs=()):
+        self.fifo_queue = JobFifoQueue()
+        self.priority_queues = {key_name: JobPriorityQueue(PRIORITY_KEYS[key_name]) for key_name in key_names}
+        self.rule = 'FIFO'  # rule of the next pop()
+        self.remaining_work = {}  # job -> remaining service time
+        self.total_remaining_work = 0.0
+        for job in jobs:
+            self.append(job)
+
+    def append(self, job):
+        if job in self.fifo_queue:
+            return
+        self.fifo_queue.append(job)
+        for priority_queue in self.priority_queues.values():
+            priority_queue.push(job)
+        self.remaining_work[job] = job.remaining_service_time
+        self.total_remaining_work += self.remaining_work[job]
+
+    def remove(self, job):
+        self.fifo_queue.remove(job)
+        for priority_queue in self.priority_queues.values():
+            priority_queue.remove(job)
+        self.total_remaining_work -= self.remaining_work.pop(job)
+        if not self.remaining_work:
+            self.total_remaining_work = 0.0  # no rounding drift on an empty queue
+
+    def discard(self, job):
+        if job in self.fifo_queue:
+            self.remove(job)
+
+    def peek(self):
+        if self.rule == 'FIFO':
+            return self.fifo_queue.peek()
+        return self.priority_queues[self.rule].peek()
+
+    def pop(self):
+        job = self.peek()
+        if job is None:
+            raise IndexError('pop from an empty JobRuleQueue')
+        self.remove(job)
+        return job
+
+    def __len__(self):
+        return len(self.fifo_queue)
+
+    def __contains__(self, job):
+        return job in self.fifo_queue
+
+    def __iter__(self):
+        return iter(self.fifo_queue)
@@ -0,0 +1,64 @@
+from global_def import *
+
+
+class Layout:
+    """
+    Factory floor geometry, built once from FACTORY_POS / WORKSTATION_POS
+    -> node 0: factory entry, node i: workstation i (same numbering as JOB_ROUTING)
+    -> distance / travel_time: node-to-node matrices, unit: feet / second
+    """
+
+    def __init__(self, factory_pos=FACTORY_POS, workstation_pos=WORKSTATION_POS, robot_speed=ROBOT_SPEED):
+        self.positions = np.array([factory_pos] + list(workstation_pos), dtype=float)
+        self.num_nodes = len(self.positions)
+        self.node_of_pos = {tuple(pos): i_node for i_node, pos in enumerate([factory_pos] + list(workstation_pos))}
+        self.robot_speed = robot_speed
+
+        delta = self.positions[:, np.newaxis, :] - self.positions[np.newaxis, :, :]
+        self.distance = np.hypot(delta[..., 0], delta[..., 1])
+        self.travel_time = self.distance / robot_speed
+
+        self.route_distance_cache = {}
+
+    def get_node(self, pos):
+        # node at this position, None if pos is not a station
+        return self.node_of_pos.get(tuple(pos))
+
+    def get_distances(self, pos):
+        # distances from pos to every node (a matrix row when pos is a station)
+        node = self.get_node(pos)
+        if node is not None:
+            return self.distance[node]
+        delta = self.positions - np.asarray(pos, dtype=float)
+        return np.hypot(delta[:, 0], delta[:, 1])
+
+    def get_distance(self, pos_start, pos_end):
+        node_start = self.get_node(pos_start)
+        node_end = self.get_node(pos_end)
+        if node_start is not None and node_end is not None:
+            return float(self.distance[node_start, node_end])
+        return math.hypot(pos_end[0] - pos_start[0], pos_end[1] - pos_start[1])
+
+    def route_distance(self, routing_list):
+        '''
+        Transport distance of a whole routing: entry -> routing_list[0] -> ... -> routing_list[-1] -> entry
+        (cached per routing, every job of a type shares it)
+        '''
+        key = tuple(routing_list)
+        if key not in self.route_distance_cache:
+            route = [0] + list(routing_list) + [0]
+            self.route_distance_cache[key] = float(self.distance[route[:-1], route[1:]].sum())
+        return self.route_distance_cache[key]
+
+    def get_station_distances(self, first_index=0):
+        '''
+        Workstation-to-workstation distances as a {(i, j): feet} dict, for the simulators under system/
+        :param first_index: key of the first workstation
+        '''
+        num_workstations = self.num_nodes - 1
+        return {(i_ws + first_index, j_ws + first_index): float(self.distance[i_ws + 1, j_ws + 1])
+                for i_ws in range(num_workstations)
+                for j_ws in range(num_workstations)}
+
+
+DEFAULT_LAYOUT = Layout()
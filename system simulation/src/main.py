@@ -1,41 +1,112 @@
 from global_def import *
 from device import *
 from gui import *
+from shared_state import *
+from sim_clock import *
 import threading
+import multiprocessing
  
 # Global pointer
-g_factory = Factory(name='Entry', pos=FACTORY_POS)
-g_job_times, g_jobs = generate_all_jobs(max_job_num=MAX_JOB_NUM,
-                                        job_arrival_rate=JOB_ARRIVAL_RATE,
-                                        seed=JOB_GENERATE_SEED)
+g_scenario = load_scenario(SCENARIO_PATH) if SCENARIO_PATH is not None else DEFAULT_SCENARIO
+g_factory = Factory(name='Entry', scenario=g_scenario)
+g_job_times, g_jobs = generate_all_jobs(seed=JOB_GENERATE_SEED, scenario=g_scenario)
 g_factory.set_jobs(g_job_times, g_jobs)
+if Q_TABLE_PATH is not None:
+    g_factory.q_table = QTable.load(Q_TABLE_PATH)  # trained by q_training.py, keeps learning online
+if TRACE_PATH is not None:
+    g_factory.trace = TraceWriter(TRACE_PATH, mode=TRACE_MODE, period=TRACE_PERIOD,
+                                  metadata={'seed': JOB_GENERATE_SEED,
+                                            'scenario': g_scenario.to_dict(),
+                                            'robot_policy': g_scenario.robot_policy,
+                                            'workstation_policy': g_scenario.workstation_policy,
+                                            'num_machines_workstation': list(g_scenario.num_machines_workstation),
+                                            'num_robots': g_scenario.num_robots})
+g_snapshots = SnapshotBuffer()  # backend -> GUI, the GUI only draws the published snapshots
 
 
 # Backend system logic (time-critical)
-def backend_system():
+def backend_system(snapshots=g_snapshots):
+    '''
+    :param snapshots: SnapshotBuffer (backend thread) or SharedStateWriter (backend process)
+    '''
+    clock = SimClock(BACKEND_SPEED_RATIO)
     while True:
 
-        # Stop the backend if the maximum running time is reached
-        if g_factory.total_run_time >= TOTAL_BACKEND_RUN_TIME:
+        # Stop the backend if the maximum running time is reached, or the GUI is closed
+        if g_factory.total_run_time >= g_scenario.total_backend_run_time or snapshots.stop_requested:
             print(f"Backend stopped after {g_factory.total_run_time:.2f} seconds.")
+            g_factory.end_run()
+            if g_factory.trace is not None:
+                g_factory.trace.flush()
+            snapshots.publish_from(g_factory, force=True)  # final state
             break
 
+        # pause / resume and speed from the GUI
+        g_factory.is_paused = snapshots.pause_requested
+        clock.set_speed(snapshots.speed_requested)
+
         # Loop update
-        g_factory.update()
-        time.sleep(BACKEND_CYCLE_TIME / BACKEND_SPEED_RATIO)
+        g_factory.update(g_scenario.backend_cycle_time)
+        snapshots.achieved_ratio = clock.achieved_ratio
+        snapshots.publish_from(g_factory)  # at most SNAPSHOT_RATE per second
+
+        # sleep only what is left of this step's wall time at the target speed
+        clock.tick(g_factory.total_run_time)
+
+
+# Backend process (GUI_BACKEND_MODE 'process'), the state goes out through the shared memory ring
+def backend_process(shm_name):
+    writer = SharedStateWriter(shm_name, g_scenario)
+    try:
+        backend_system(writer)
+    finally:
+        writer.close()
+        # write out the buffered trace
+        if g_factory.trace is not None:
+            g_factory.trace.close()
 
 
-# Starting both threads
+# Starting backend and GUI
 if __name__ == "__main__":
-    # Create the backend thread
-    backend_thread = threading.Thread(target=backend_system)
-    backend_thread.daemon = True  # Ensure the backend stops when the main program exits
-    backend_thread.start()
+    if GUI_BACKEND_MODE == 'thread':
+        # Create the backend thread
+        backend_thread = threading.Thread(target=backend_system)
+        backend_thread.daemon = True  # Ensure the backend stops when the main program exits
+        backend_thread.start()
+
+        # Run the frontend GUI in the main thread
+        gui = GraphicUserInterface(factory=g_factory, snapshots=g_snapshots)
+        gui.run()
+        gui.stop()
+
+        # let the backend finish its step, then write out the buffered trace
+        g_snapshots.request_stop()
+        backend_thread.join()
+        if g_factory.trace is not None:
+            g_factory.trace.close()
+
+    elif GUI_BACKEND_MODE == 'process':
+        # the GUI process owns the shared block, the backend process attaches to it by name
+        shm = create_shared_state(g_scenario)
+        reader = SharedStateReader(shm, g_scenario)
+        backend = multiprocessing.Process(target=backend_process, args=(shm.name,), daemon=True)
+        backend.start()
+        try:
+            # Run the frontend GUI in the main process, it never touches g_factory
+            gui = GraphicUserInterface(factory=None, snapshots=reader)
+            gui.run()
+            gui.stop()
+        finally:
+            reader.request_stop()
+            backend.join(timeout=5)
+            if backend.is_alive():
+                backend.terminate()
+            reader.close()
+            shm.close()
+            shm.unlink()
 
-    # Run the frontend GUI in the main thread
-    gui = GraphicUserInterface(factory=g_factory)
-    gui.run()
-    gui.stop()
+    else:
+        raise ValueError(f'GUI_BACKEND_MODE {GUI_BACKEND_MODE} not recognized')
 
 
 
@@ -45,9 +116,8 @@ if __name__ == "__main__":
 
 # if __name__ == "__main__":
 #     g_factory = Factory(name="Entry", pos=(0, 0))
-#     g_factory.robot_policy = 'Q_LEARNING_QUEUE'  # 启用 Q-Learning 队列优化
 #     for ws in g_factory.workstations:
-#         ws.initialize_q_table()  # 初始化 Q 表
+#         ws.workstation_policy = 'Q_LEARNING_QUEUE'  # 启用 Q-Learning 队列优化
 #
 #     # 启动线程和 GUI
 #     backend_thread = threading.Thread(target=backend_system, args=(g_factory,))
@@ -1,18 +1,18 @@
-import pandas as pd
+import os
+import sys
 import matplotlib.pyplot as plt
 
-# 读取数据
-df = pd.read_csv('queue_log_40_R_random_W_random_646444.csv', names=['Time', 'Workstation', 'QueueLength'])
+from tracer import read_queue_trace
 
-# 找到所有 Workstation 的编号
-workstations = sorted(df['Workstation'].unique())
+# 读取数据（trace 文件由 TRACE_PATH / headless.py --trace 生成，'.npz' 只读取队列列）
+trace_path = sys.argv[1] if len(sys.argv) > 1 else 'queue_log.csv'
+trace_name = os.path.splitext(os.path.basename(trace_path))[0]
+series, metadata = read_queue_trace(trace_path)
 
 # 依次为每个 Workstation 生成一张图
-for ws in workstations:
-    ws_df = df[df['Workstation'] == ws]
-
+for ws, (time_values, queue_lengths) in sorted(series.items()):
     plt.figure(figsize=(8, 5))
-    plt.plot(ws_df['Time'], ws_df['QueueLength'], label=f'Workstation {ws}', color='b')
+    plt.step(time_values, queue_lengths, where='post', label=f'Workstation {ws}', color='b')
 
     # 设置标题和标签
     plt.xlabel('Time (s)')
@@ -22,7 +22,7 @@ for ws in workstations:
     plt.grid(True)
 
     # 保存单独的图像
-    plt.savefig(f'queue_congestion_ws{ws}_40_R_distance_W_fifo_646444.png')
+    plt.savefig(f'queue_congestion_ws{ws}_{trace_name}.png')
     plt.close()  # 关闭当前图，防止占用过多内存
 
 print("✅ Successfully saved individual queue congestion plots for each Workstation.")
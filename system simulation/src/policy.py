@@ -0,0 +1,228 @@
+'''
+Robot / workstation policy registry
+-> a policy object is resolved once from its name (Factory.robot_policy / Workstation.workstation_policy)
+-> the devices call the event hooks (on_job_ready, on_robot_idle, on_job_queued, on_machine_idle),
+   dispatch() only runs after a hook has reported a change
+-> new heuristics: subclass RobotPolicy / WorkstationPolicy and register them by name
+'''
+import functools
+
+from global_def import *
+from job_queue import *
+from q_table import *
+
+ROBOT_POLICIES = {}  # name -> RobotPolicy class (or factory function)
+WORKSTATION_POLICIES = {}  # name -> WorkstationPolicy class (or factory function)
+
+
+def register_robot_policy(name):
+    def register(policy_class):
+        ROBOT_POLICIES[name] = policy_class
+        return policy_class
+    return register
+
+
+def register_workstation_policy(name):
+    def register(policy_class):
+        WORKSTATION_POLICIES[name] = policy_class
+        return policy_class
+    return register
+
+
+def make_robot_policy(name, factory):
+    if name not in ROBOT_POLICIES:
+        raise ValueError(f'POLICY_NAME {name} not recognized')
+    return ROBOT_POLICIES[name](factory)
+
+
+def make_workstation_policy(name, workstation):
+    if name not in WORKSTATION_POLICIES:
+        raise ValueError(f'POLICY_NAME {name} not recognized')
+    return WORKSTATION_POLICIES[name](workstation)
+
+
+class RobotPolicy:
+    """
+    Hands the ready jobs of the factory to idle robots
+    -> dispatch() is only called after on_job_ready / on_robot_idle,
+       an idle robot and a ready job can only meet after one of them
+    """
+
+    def __init__(self, factory, priority_key=None):
+        self.factory = factory
+        self.pending = True  # something changed since the last dispatch
+
+        # priority key of the ready jobs per station (see DispatchIndex), None: not needed
+        self.priority_key = priority_key
+        factory.dispatch_index.set_priority_key(priority_key)
+
+    def on_job_ready(self, job, node):
+        self.pending = True
+
+    def on_robot_idle(self, robot):
+        self.pending = True
+
+    def run(self):
+        if self.pending:
+            self.pending = False
+            self.dispatch()
+
+    def dispatch(self):
+        raise NotImplementedError
+
+
+@register_robot_policy('DEFAULT')
+class RandomRobotPolicy(RobotPolicy):
+    # every idle robot takes a random ready job
+    def dispatch(self):
+        factory = self.factory
+        for robot in factory.robots:
+            if robot.is_idle() and len(factory.ready_jobs) > 0:
+                robot.add_job(factory.ready_jobs.choice())
+
+
+@register_robot_policy('DISTANCE')
+class DistanceRobotPolicy(RobotPolicy):
+    # every idle robot goes to the nearest station (workstation output or factory entry) with ready jobs
+    def dispatch(self):
+        dispatch_index = self.factory.dispatch_index
+        for robot in self.factory.robots:
+            if robot.is_idle():
+                closest_node = dispatch_index.nearest_station(robot.pos)
+                if closest_node is not None:
+                    robot.add_job(self.choose_job(closest_node))
+
+    def choose_job(self, node):
+        return self.factory.dispatch_index.ready_sets[node].choice()
+
+
+class DistancePriorityRobotPolicy(DistanceRobotPolicy):
+    # nearest station, then its ready job with the smallest priority key
+    def choose_job(self, node):
+        return self.factory.dispatch_index.best_ready(node)
+
+
+for key_name, key in PRIORITY_KEYS.items():
+    register_robot_policy(f'DISTANCE_{key_name}')(functools.partial(DistancePriorityRobotPolicy, priority_key=key))
+
+
+class WorkstationPolicy:
+    """
+    Hands the queued jobs of a workstation to its idle machines
+    -> make_queue() builds the input queue, input_queue.pop() is the next job to start
+    -> dispatch() is only called after on_job_queued / on_machine_idle
+    -> on_run_end() once the run is over
+    """
+
+    def __init__(self, workstation):
+        self.workstation = workstation
+        self.pending = True  # something changed since the last dispatch
+
+    def make_queue(self, jobs=()):
+        return JobFifoQueue(jobs)
+
+    def on_job_queued(self, job):
+        self.pending = True
+
+    def on_machine_idle(self, machine):
+        self.pending = True
+
+    def on_run_end(self):
+        pass
+
+    def run(self, dt=BACKEND_CYCLE_TIME):
+        if self.pending:
+            self.pending = False
+            self.dispatch(dt)
+
+    def dispatch(self, dt=BACKEND_CYCLE_TIME):
+        workstation = self.workstation
+        while workstation.idle_machines and workstation.input_queue_len > 0:
+            temp_job = workstation.input_queue.pop()
+            workstation.record_input_queue_len()
+            workstation.assign_job(temp_job, dt)
+
+
+@register_workstation_policy('FIFO')
+class FifoWorkstationPolicy(WorkstationPolicy):
+    pass
+
+
+@register_workstation_policy('RANDOM')
+class RandomWorkstationPolicy(WorkstationPolicy):
+    def make_queue(self, jobs=()):
+        return JobSet(jobs)
+
+
+class PriorityWorkstationPolicy(WorkstationPolicy):
+    # NEH / SPT / EDD / LWKR: the best queued job by priority key goes first
+    def __init__(self, workstation, priority_key):
+        super().__init__(workstation)
+        self.priority_key = priority_key
+
+    def make_queue(self, jobs=()):
+        return JobPriorityQueue(self.priority_key, jobs)
+
+
+for key_name, key in PRIORITY_KEYS.items():
+    register_workstation_policy(key_name)(functools.partial(PriorityWorkstationPolicy, priority_key=key))
+
+
+@register_workstation_policy('Q_LEARNING_QUEUE')
+class QLearningQueuePolicy(WorkstationPolicy):
+    """
+    Q-Learning 队列优化：每次分配Job前，按 Q 表选择一个分配规则 (Q_ACTIONS: FIFO / SPT / LWKR / ...)
+    -> state: (工作站, 队列长度区间, 队列剩余加工时间区间)
+    -> reward: 两次决策之间队列长度的时间积分取负 (job-hours of queueing)
+    -> Q 表 (QTable) 由工厂的所有工作站共享，factory.q_table 为 None 时新建
+    """
+
+    def __init__(self, workstation):
+        super().__init__(workstation)
+        self.last_state = None  # state / action / queue area of the previous decision
+        self.last_action = None
+        self.last_area = 0.0
+
+    def make_queue(self, jobs=()):
+        return JobRuleQueue([rule for rule in Q_ACTIONS if rule != 'FIFO'], jobs)
+
+    def get_q_table(self):
+        factory = self.workstation.parent
+        if factory.q_table is None:
+            factory.q_table = QTable(factory.num_workstations)
+        return factory.q_table
+
+    def get_current_state(self):
+        """获取当前队列状态"""
+        queue = self.workstation.input_queue
+        return QTable.get_state(self.workstation.index, len(queue), queue.total_remaining_work)
+
+    def decide(self):
+        # learn from the previous decision, then choose the rule of the next job
+        q_table = self.get_q_table()
+        state = self.get_current_state()
+        area = self.workstation.queue_len_stat.get_area(self.workstation.total_run_time)
+        if self.last_state is not None and q_table.alpha > 0:
+            reward = -(area - self.last_area) / 3600
+            q_table.update(self.last_state, self.last_action, reward, state)
+
+        action = q_table.select_action(state)
+        self.workstation.input_queue.rule = Q_ACTIONS[action]
+        self.last_state, self.last_action, self.last_area = state, action, area
+
+    def on_run_end(self):
+        # terminal update: the last decision is rewarded up to the end of the run, nothing to bootstrap from
+        q_table = self.get_q_table()
+        if self.last_state is not None and q_table.alpha > 0:
+            area = self.workstation.queue_len_stat.get_area(self.workstation.total_run_time)
+            q_table.update(self.last_state, self.last_action, -(area - self.last_area) / 3600, None)
+        self.last_state = None
+
+    def dispatch(self, dt=BACKEND_CYCLE_TIME):
+        workstation = self.workstation
+        while workstation.idle_machines and workstation.input_queue_len > 0:
+            if workstation.input_queue_len > 1:  # a single job needs no decision
+                self.decide()
+            temp_job = workstation.input_queue.pop()
+            workstation.record_input_queue_len()
+            workstation.assign_job(temp_job, dt)
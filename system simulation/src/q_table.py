@@ -0,0 +1,84 @@
+from global_def import *
+import json
+
+
+class QTable:
+    """
+    Tabular Q-values of the Q_LEARNING_QUEUE workstation policy as one NumPy array
+    -> state: (workstation, queue length bucket, queue remaining work bucket), see get_state()
+    -> action: index of the dispatch rule in Q_ACTIONS used for the next job
+    -> visits counts the updates per (state, action), used to merge tables trained in parallel
+    """
+
+    def __init__(self, num_workstations=NUM_WORKSTATIONS, alpha=ALPHA, gamma=GAMMA, epsilon=EPSILON):
+        self.shape = (num_workstations, len(Q_QUEUE_LEN_BUCKETS) + 1, len(Q_WORK_BUCKETS) + 1, len(Q_ACTIONS))
+        self.values = np.zeros(self.shape)
+        self.visits = np.zeros(self.shape, dtype=np.int64)
+
+        self.alpha = alpha  # learning rate, 0: no learning (evaluation)
+        self.gamma = gamma  # discount factor per decision
+        self.epsilon = epsilon  # exploration rate, 0: greedy
+
+    @staticmethod
+    def get_state(workstation_index, queue_len, remaining_work):
+        '''
+        :param remaining_work: remaining service time of all queued jobs, unit: second
+        :return: discretized state, index tuple into values[..., action]
+        '''
+        return (workstation_index,
+                int(np.searchsorted(Q_QUEUE_LEN_BUCKETS, queue_len, side='right')),
+                int(np.searchsorted(Q_WORK_BUCKETS, remaining_work / 3600, side='right')))
+
+    def select_action(self, state):
+        """基于 epsilon-greedy 策略选择动作"""
+        if np.random.rand() < self.epsilon:  # 探索
+            return np.random.randint(len(Q_ACTIONS))
+        return int(np.argmax(self.values[state]))  # 利用
+
+    def update(self, state, action, reward, next_state):
+        """更新 Q 值 (next_state None: end of episode)"""
+        target = reward
+        if next_state is not None:
+            target += self.gamma * self.values[next_state].max()
+        index = state + (action,)
+        self.values[index] += self.alpha * (target - self.values[index])
+        self.visits[index] += 1
+
+    def copy(self):
+        q_table = QTable(self.shape[0], self.alpha, self.gamma, self.epsilon)
+        q_table.values = self.values.copy()
+        q_table.visits = self.visits.copy()
+        return q_table
+
+    @staticmethod
+    def merge(base, q_tables):
+        '''
+        Combine tables trained in parallel from the same base table:
+        visit-weighted mean of the values learned in this round, the base value where nobody learned
+        '''
+        merged = base.copy()
+        new_visits = sum(q_table.visits - base.visits for q_table in q_tables)
+        weighted_values = sum((q_table.visits - base.visits) * q_table.values for q_table in q_tables)
+        learned = new_visits > 0
+        merged.values[learned] = weighted_values[learned] / new_visits[learned]
+        merged.visits = base.visits + new_visits
+        return merged
+
+    def save(self, path):
+        # checkpoint: arrays plus the hyper parameters and the state/action definition
+        meta = dict(alpha=self.alpha, gamma=self.gamma, epsilon=self.epsilon, actions=list(Q_ACTIONS),
+                    queue_len_buckets=list(Q_QUEUE_LEN_BUCKETS), work_buckets=list(Q_WORK_BUCKETS))
+        with open(path, 'wb') as file:
+            np.savez(file, values=self.values, visits=self.visits, meta=np.array(json.dumps(meta)))
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if (meta['actions'] != list(Q_ACTIONS) or meta['queue_len_buckets'] != list(Q_QUEUE_LEN_BUCKETS)
+                    or meta['work_buckets'] != list(Q_WORK_BUCKETS)):
+                raise ValueError(f'Q table {path} does not match the current Q_ACTIONS / bucket settings')
+            q_table = QTable(data['values'].shape[0], meta['alpha'], meta['gamma'], meta['epsilon'])
+            q_table.values = data['values'].copy()
+            q_table.visits = data['visits'].copy()
+        return q_table
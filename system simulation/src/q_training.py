@@ -0,0 +1,103 @@
+'''
+Offline training of the Q_LEARNING_QUEUE workstation policy
+-> every round runs one headless episode per seed in parallel, all starting from the same QTable
+-> the tables learned in a round are merged (visit-weighted) and epsilon decays for the next round
+-> the table is checkpointed after every round, --resume continues from the checkpoint
+-> usage: python q_training.py --rounds 20 --seeds 8 --checkpoint q_table.npz
+   then:  python headless.py --workstation-policy Q_LEARNING_QUEUE --q-table q_table.npz
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+from global_def import *
+from headless import *
+
+
+def _run_episode(args):
+    config, until, q_table = args
+    result = run_headless(config, until=until, q_table=q_table)
+    return q_table, result
+
+
+def train(rounds=20, num_seeds=8, until=None, base_config=None, q_table=None,
+          checkpoint_path=None, epsilon_decay=0.85, min_epsilon=0.01, max_workers=None, verbose=True):
+    '''
+    :param rounds: number of training rounds
+    :param num_seeds: episodes (job generation seeds) per round, run in parallel
+    :param base_config: RunConfig of the episodes, the workstation policy is forced to Q_LEARNING_QUEUE
+    :param q_table: QTable to continue from, None: start from zeros
+    :param checkpoint_path: .npz file written after every round, None: no checkpoint
+    :param max_workers: number of worker processes, 1 runs serially in this process
+    :return: (trained QTable, list of per-round (epsilon, mean throughput, mean job time))
+    '''
+    if base_config is None:
+        base_config = RunConfig()
+    base_config = replace(base_config, workstation_policy='Q_LEARNING_QUEUE', q_table_path=None, trace_path=None)
+    if q_table is None:
+        q_table = QTable(base_config.scenario.num_workstations)
+
+    history = []
+    executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers != 1 else None
+    try:
+        for i_round in range(rounds):
+            # fresh job data every round
+            seeds = [base_config.seed + i_round * num_seeds + i_seed for i_seed in range(num_seeds)]
+            tasks = [(replace(base_config, seed=seed), until, q_table.copy()) for seed in seeds]
+            if executor is None:
+                episodes = [_run_episode(task) for task in tasks]
+            else:
+                episodes = list(executor.map(_run_episode, tasks))
+
+            q_table = QTable.merge(q_table, [episode_table for episode_table, _ in episodes])
+            results = [result for _, result in episodes]
+            history.append((q_table.epsilon,
+                            float(np.mean([result.throughput for result in results])),
+                            float(np.nanmean([result.mean_job_time for result in results]))))
+            if verbose:
+                print(f'Round {i_round + 1}/{rounds}: epsilon {q_table.epsilon:.3f}, '
+                      f'throughput {history[-1][1]:.2f} /h, mean job time {history[-1][2]:.1f} s, '
+                      f'visited {np.count_nonzero(q_table.visits)}/{q_table.visits.size}')
+
+            q_table.epsilon = max(q_table.epsilon * epsilon_decay, min_epsilon)
+            if checkpoint_path is not None:
+                q_table.save(checkpoint_path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return q_table, history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the Q_LEARNING_QUEUE workstation policy headless.')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--seeds', type=int, default=8, help='episodes per round, run in parallel')
+    parser.add_argument('--base-seed', type=int, default=JOB_GENERATE_SEED)
+    parser.add_argument('--scenario', default=None, help='scenario file (.json / .toml / .yaml)')
+    parser.add_argument('--robot-policy', default=None, help='default: the scenario policy')
+    parser.add_argument('--until', type=float, default=None, help='simulated time, unit: second')
+    parser.add_argument('--checkpoint', default='q_table.npz', help='Q table written after every round')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args(argv)
+
+    q_table = QTable.load(args.checkpoint) if args.resume else None
+    start_time = time.perf_counter()
+    q_table, history = train(rounds=args.rounds,
+                             num_seeds=args.seeds,
+                             until=args.until,
+                             base_config=RunConfig(seed=args.base_seed,
+                                                   scenario=load_scenario(args.scenario) if args.scenario
+                                                   else DEFAULT_SCENARIO,
+                                                   robot_policy=args.robot_policy),
+                             q_table=q_table,
+                             checkpoint_path=args.checkpoint,
+                             max_workers=args.workers)
+    print(f'{args.rounds * args.seeds} episodes in {time.perf_counter() - start_time:.1f} s, '
+          f'Q table saved to {args.checkpoint}')
+    return q_table, history
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+'''
+Text rendering for the GUI
+-> FONTS: one pygame font per (family, size, style), created on first use (after pygame.init()) and then reused
+-> TEXT_CACHE: LRU cache of rendered text surfaces keyed by (text, style), a text line that did not change
+   between two frames is blitted from the cache instead of being rendered again
+-> Scene: retained drawing for GraphicUserInterface, only the items that changed since the last frame are redrawn
+-> pygame is only imported inside the functions, the backend stays importable without a display
+'''
+import functools
+from collections import OrderedDict
+
+from global_def import *
+
+
+class FontRegistry:
+    """
+    Shared pygame fonts, style: 'regular' / 'bold' / 'italic'
+    """
+
+    def __init__(self):
+        self.fonts = {}  # (family, size, style) -> pygame.font.Font
+
+    def get(self, style='regular', size=FONT_SIZE, family=FONT_FAMILY):
+        key = (family, size, style)
+        font = self.fonts.get(key)
+        if font is None:
+            import pygame
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.SysFont(family, size, bold=(style == 'bold'), italic=(style == 'italic'))
+            self.fonts[key] = font
+        return font
+
+    def clear(self):
+        # fonts die with pygame.quit()
+        self.fonts.clear()
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces
+    -> render(): one text in one style
+    -> render_line(): a whole text line, **bold** / *italic* words rendered in their style, as one surface
+    """
+
+    def __init__(self, fonts, max_size=TEXT_CACHE_SIZE):
+        self.fonts = fonts
+        self.max_size = max_size
+        self.surfaces = OrderedDict()  # key -> pygame.Surface, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+            return None
+        self.surfaces.move_to_end(key)
+        self.hits += 1
+        return surface
+
+    def put(self, key, surface):
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def render(self, text, style='regular', color=COLOR_BLACK, size=FONT_SIZE, family=FONT_FAMILY):
+        key = ('text', text, style, color, size, family)
+        surface = self.get(key)
+        if surface is None:
+            surface = self.put(key, self.fonts.get(style, size, family).render(text, True, color))
+        return surface
+
+    def render_line(self, text, color=COLOR_BLACK, markup=True, word_gap=5):
+        '''
+        :param markup: render **word** bold and *word* italic (markers stripped), False: all regular
+        :param word_gap: space between two words, unit: pixel
+        '''
+        key = ('line', text, color, markup, word_gap)
+        surface = self.get(key)
+        if surface is not None:
+            return surface
+
+        import pygame
+        word_surfaces = []
+        for word in text.split(' '):
+            style = 'regular'
+            if markup and word.startswith('**') and word.endswith('**'):
+                word, style = word[2:-2], 'bold'
+            elif markup and word.startswith('*') and word.endswith('*'):
+                word, style = word[1:-1], 'italic'
+            word_surfaces.append(self.fonts.get(style).render(word, True, color))
+
+        width = sum(word_surface.get_width() for word_surface in word_surfaces) + word_gap * (len(word_surfaces) - 1)
+        height = max(word_surface.get_height() for word_surface in word_surfaces)
+        surface = pygame.Surface((max(width, 1), max(height, 1)), pygame.SRCALPHA)
+        x_offset = 0
+        for word_surface in word_surfaces:
+            # vertically center every word on the line
+            surface.blit(word_surface, (x_offset, (height - word_surface.get_height()) // 2))
+            x_offset += word_surface.get_width() + word_gap
+        return self.put(key, surface)
+
+
+FONTS = FontRegistry()
+TEXT_CACHE = TextCache(FONTS)
+
+
+def clear_render_cache():
+    # call on pygame.quit(), the fonts and surfaces are no longer valid
+    TEXT_CACHE.clear()
+    FONTS.clear()
+
+
+class Scene:
+    """
+    Dirty-region drawing on top of a cached background layer
+    -> every frame the devices add their items in drawing order: add(key, signature, rect, paint)
+    -> an item with the same signature and rect as in the last frame is not painted again
+    -> the old and new rects of changed / vanished items are dirty: they are restored from the background layer,
+       every item overlapping them is repainted clipped to the rect, end() returns them for pygame.display.update
+    -> static items (box borders) are painted once into the background layer
+    """
+
+    def __init__(self, screen, background_color=COLOR_LIGHT_GREY):
+        import pygame
+        self.screen = screen
+        self.background_color = background_color
+        self.background = pygame.Surface(screen.get_size()).convert(screen)
+        self.items = {}  # key -> (signature, rect, paint), this frame
+        self.last_items = {}  # key -> (signature, rect, paint), last frame
+        self.static_items = {}  # key -> (signature, rect, paint)
+        self.last_static_signature = None
+        self.full_redraw = True
+
+    def invalidate(self):
+        # repaint the whole window on the next end() (first frame, window exposed)
+        self.full_redraw = True
+
+    def begin(self):
+        self.items = {}
+        self.static_items = {}
+
+    def add(self, key, signature, rect, paint, static=False):
+        '''
+        :param signature: hashable summary of what the item shows, the item is repainted when it changes
+        :param rect: pygame.Rect covering everything paint() draws
+        :param paint: function(surface) drawing the item
+        '''
+        (self.static_items if static else self.items)[key] = (signature, rect, paint)
+
+    def end(self):
+        screen = self.screen
+
+        # static layer: rebuilt only when the static items change
+        static_signature = tuple((key, signature, tuple(rect)) for key, (signature, rect, _) in self.static_items.items())
+        if static_signature != self.last_static_signature:
+            self.background.fill(self.background_color)
+            for _, _, paint in self.static_items.values():
+                paint(self.background)
+            self.last_static_signature = static_signature
+            self.full_redraw = True
+
+        if self.full_redraw:
+            dirty_rects = [screen.get_rect()]
+            self.full_redraw = False
+        else:
+            dirty_rects = []
+            for key, (signature, rect, _) in self.items.items():
+                last_item = self.last_items.get(key)
+                if last_item is None:
+                    dirty_rects.append(rect)
+                elif last_item[0] != signature or last_item[1] != rect:
+                    dirty_rects.append(rect)
+                    dirty_rects.append(last_item[1])
+            dirty_rects += [last_item[1] for key, last_item in self.last_items.items() if key not in self.items]
+
+        if dirty_rects:
+            items = list(self.items.values())
+            item_rects = [rect for _, rect, _ in items]
+            for dirty_rect in dirty_rects:
+                screen.set_clip(dirty_rect)
+                screen.blit(self.background, dirty_rect, dirty_rect)
+                for i_item in dirty_rect.collidelistall(item_rects):  # ascending: drawing order is kept
+                    items[i_item][2](screen)
+            screen.set_clip(None)
+
+        self.last_items = self.items
+        return dirty_rects
+
+
+def draw_item(screen, key, signature, rect, paint, static=False):
+    '''
+    Paint now on a plain surface, or hand the item to a Scene (painted in Scene.end() if it changed)
+    '''
+    if isinstance(screen, Scene):
+        screen.add(key, signature, rect, paint, static)
+    else:
+        paint(screen)
+
+
+def paint_border(rect, surface):
+    import pygame
+    pygame.draw.rect(surface, COLOR_BLACK, rect, 2)
+
+
+def paint_text_line(line_rect, bg_color, line_surface, surface):
+    import pygame
+    pygame.draw.rect(surface, bg_color, line_rect)
+    surface.blit(line_surface, (line_rect.left + 10, line_rect.centery - line_surface.get_height() // 2))
+
+
+# Draw text box function for top center alignment
+def draw_text_box(screen, text_lines, position,
+                  top_center=True,
+                  align_center=True,
+                  show_box=True,
+                  max_width=200, max_height=None,
+                  line_height=26, markup=True, key=None):
+    '''
+    :param screen: pygame surface or Scene
+    :param key: Scene key of the box, None: the position
+    :param text_lines: list of (text, background color), words in **bold** / *italic* unless markup is False
+    :param position: anchor, the box is drawn below (top_center) or above it
+    '''
+    import pygame  # GUI only, keep the backend importable without a display
+
+    padding = 5
+    total_height = len(text_lines) * line_height + padding
+    # 如果设置了最大高度，并且总高度超过了最大高度，则设置为最大高度
+    if max_height and total_height > max_height:
+        total_height = max_height
+
+        # 将文本裁剪为适应框高的内容
+        max_lines = max_height // line_height
+        text_lines = text_lines[:max_lines]  # 只保留显示框内的行
+
+    # Calculate the top left position to center the text box at the top/bottom center of the Box
+    box_x = position[0] - max_width // 2
+    box_y = position[1] + 30 if top_center else position[1] - total_height - 40
+
+    if key is None:
+        key = tuple(position)
+
+    # Draw the black border around the text box (static layer)
+    if show_box:
+        border_rect = pygame.Rect(box_x - 5, box_y - 5, max_width + 10, total_height + 10)
+        draw_item(screen, ('border', key), None, border_rect, functools.partial(paint_border, border_rect),
+                  static=True)
+
+    for i, (text, bg_color) in enumerate(text_lines):
+        line_rect = pygame.Rect(box_x, box_y + i * line_height, max_width, line_height)
+
+        # the whole line comes from the cache unless its text changed
+        line_surface = TEXT_CACHE.render_line(text, markup=markup)
+        paint_rect = line_rect.union(pygame.Rect(line_rect.left + 10, line_rect.top,  # text may overflow the box
+                                                 line_surface.get_width(), line_height))
+        draw_item(screen, ('line', key, i), (text, bg_color), paint_rect,
+                  functools.partial(paint_text_line, line_rect, bg_color, line_surface))
@@ -0,0 +1,181 @@
+'''
+Replication manager: N seeds x M policy combinations over all CPU cores
+-> each worker builds its own Factory through run_headless()
+-> results are aggregated into means with 95% confidence intervals
+-> usage: python replication.py --seeds 20 --robot-policies DEFAULT DISTANCE --workstation-policies FIFO NEH
+'''
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+from global_def import *
+from headless import *
+
+# Two-sided 95% Student-t quantiles, indexed by degrees of freedom
+T_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+         10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+         18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+         26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def t_quantile_975(dof):
+    # exact with SciPy, otherwise the table entry of the nearest smaller dof (a wider, conservative interval)
+    try:
+        from scipy.stats import t
+        return float(t.ppf(0.975, dof))
+    except ImportError:
+        pass
+    if dof in T_975:
+        return T_975[dof]
+    return T_975[max(key for key in T_975 if key < dof)]
+
+
+@dataclass
+class Estimate:
+    mean: float
+    half_width: float  # half width of the 95% confidence interval
+    n: int
+
+    @property
+    def ci_low(self):
+        return self.mean - self.half_width
+
+    @property
+    def ci_high(self):
+        return self.mean + self.half_width
+
+    def __str__(self):
+        return f'{self.mean:.3f} ± {self.half_width:.3f}'
+
+
+def estimate(values):
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return Estimate(float('nan'), float('nan'), 0)
+    if n == 1:
+        return Estimate(float(values[0]), float('nan'), 1)
+    half_width = t_quantile_975(n - 1) * values.std(ddof=1) / np.sqrt(n)
+    return Estimate(float(values.mean()), float(half_width), n)
+
+
+@dataclass
+class PolicySummary:
+    robot_policy: str
+    workstation_policy: str
+    results: list  # RunResult of every seed
+    throughput: Estimate
+    mean_job_time: Estimate
+    robot_utilization: Estimate
+    machine_utilization: Estimate
+    workstation_lq: list  # Estimate per workstation
+    workstation_wq: list
+    factory_lq: Estimate
+    factory_wq: Estimate
+    factory_l: Estimate
+    factory_w: Estimate
+
+
+def summarize(robot_policy, workstation_policy, results):
+    num_workstations = len(results[0].workstation_lq)
+    return PolicySummary(
+        robot_policy=robot_policy,
+        workstation_policy=workstation_policy,
+        results=results,
+        throughput=estimate([result.throughput for result in results]),
+        mean_job_time=estimate([result.mean_job_time for result in results]),
+        robot_utilization=estimate([np.mean(result.robot_utilization) for result in results]),
+        machine_utilization=estimate([np.mean(list(itertools.chain(*result.machine_utilization)))
+                                      for result in results]),
+        workstation_lq=[estimate([result.workstation_lq[i_ws] for result in results])
+                        for i_ws in range(num_workstations)],
+        workstation_wq=[estimate([result.workstation_wq[i_ws] for result in results])
+                        for i_ws in range(num_workstations)],
+        factory_lq=estimate([result.factory_lq for result in results]),
+        factory_wq=estimate([result.factory_wq for result in results]),
+        factory_l=estimate([result.factory_l for result in results]),
+        factory_w=estimate([result.factory_w for result in results]),
+    )
+
+
+def _run_replication(args):
+    config, until = args
+    return run_headless(config, until=until)
+
+
+def run_replications(seeds, policies, until=None, base_config=None, max_workers=None):
+    '''
+    Run every (seed, policy) pair and aggregate the results per policy combination
+    :param seeds: list of job generation seeds
+    :param policies: list of (robot_policy, workstation_policy)
+    :param until: simulated run time of each replication, unit: second, None for the scenario's
+    :param base_config: RunConfig (and Scenario) the seed/policies are applied to
+    :param max_workers: number of worker processes, 1 runs serially in this process
+    :return: list of PolicySummary, in the order of policies
+    '''
+    if base_config is None:
+        base_config = RunConfig()
+
+    tasks = [(replace(base_config, seed=seed, robot_policy=robot_policy, workstation_policy=workstation_policy),
+              until)
+             for robot_policy, workstation_policy in policies
+             for seed in seeds]
+
+    if max_workers == 1:
+        results = [_run_replication(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # chunks keep the per-task IPC small compared to one replication
+            chunksize = max(1, len(tasks) // ((max_workers or os.cpu_count() or 1) * 4))
+            results = list(executor.map(_run_replication, tasks, chunksize=chunksize))
+
+    summaries = []
+    for i_policy, (robot_policy, workstation_policy) in enumerate(policies):
+        policy_results = results[i_policy * len(seeds):(i_policy + 1) * len(seeds)]
+        summaries.append(summarize(robot_policy, workstation_policy, policy_results))
+    return summaries
+
+
+def print_summary(summary):
+    print(f'Robot {summary.robot_policy} / Workstation {summary.workstation_policy} '
+          f'({summary.throughput.n} replications, mean ± 95% CI)')
+    print(f'  Throughput: {summary.throughput} /h')
+    print(f'  Mean job time: {summary.mean_job_time} s')
+    print(f'  Robot util: {summary.robot_utilization}')
+    print(f'  Machine util: {summary.machine_utilization}')
+    print(f'  Entry LQ: {summary.factory_lq}, WQ: {summary.factory_wq} s')
+    print(f'  Factory L: {summary.factory_l}, W: {summary.factory_w} s')
+    for i_ws, (lq, wq) in enumerate(zip(summary.workstation_lq, summary.workstation_wq)):
+        print(f'  W{i_ws + 1} LQ: {lq}, WQ: {wq} s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run independent replications in parallel.')
+    parser.add_argument('--seeds', type=int, default=10, help='number of replications per policy combination')
+    parser.add_argument('--base-seed', type=int, default=JOB_GENERATE_SEED)
+    parser.add_argument('--scenario', default=None, help='scenario file (.json / .toml / .yaml)')
+    parser.add_argument('--robot-policies', nargs='+', default=None, help='default: the scenario policy')
+    parser.add_argument('--workstation-policies', nargs='+', default=None, help='default: the scenario policy')
+    parser.add_argument('--until', type=float, default=None, help='simulated time, unit: second')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--q-table', default=Q_TABLE_PATH, help='Q table checkpoint for Q_LEARNING_QUEUE')
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario) if args.scenario else DEFAULT_SCENARIO
+    seeds = [args.base_seed + i_seed for i_seed in range(args.seeds)]
+    policies = list(itertools.product(args.robot_policies or [scenario.robot_policy],
+                                      args.workstation_policies or [scenario.workstation_policy]))
+
+    start_time = time.perf_counter()
+    summaries = run_replications(seeds, policies, until=args.until,
+                                 base_config=RunConfig(scenario=scenario, q_table_path=args.q_table),
+                                 max_workers=args.workers)
+    for summary in summaries:
+        print_summary(summary)
+    print(f'{len(seeds) * len(policies)} replications in {time.perf_counter() - start_time:.1f} s')
+    return summaries
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+'''
+Scenario: everything that defines one factory configuration, as an immutable object
+-> DEFAULT_SCENARIO holds the values of global_def.py
+-> load_scenario() reads a .json / .toml / .yaml file, missing keys keep the default value
+-> Factory / Job / generate_all_jobs take a scenario, so differently configured factories can run in one process
+'''
+import json
+import functools
+from dataclasses import dataclass, fields, asdict, replace
+
+from global_def import *
+from layout import *
+
+
+def _freeze(value):
+    # lists (from a file or a caller) -> nested tuples, so the scenario stays immutable and hashable
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str = 'default'
+
+    # policies
+    robot_policy: str = ROBOT_POLICY_NAME
+    workstation_policy: str = WORKSTATION_POLICY_NAME
+
+    # workstations / robots
+    num_machines_workstation: tuple = tuple(NUM_MACHINES_WORKSTATION)
+    workstation_pos: tuple = _freeze(WORKSTATION_POS)  # unit: feet
+    factory_pos: tuple = FACTORY_POS
+    num_robots: int = NUM_ROBOTS
+    robot_speed: float = ROBOT_SPEED  # unit: feet per second
+
+    # jobs
+    job_arrival_rate: float = JOB_ARRIVAL_RATE  # jobs per second
+    max_job_num: int = MAX_JOB_NUM
+    job_routing: tuple = _freeze(JOB_ROUTING)  # per job type, workstation numbers start from 1
+    job_time_gamma: float = JOB_TIME_GAMMA
+    job_time_mean: tuple = _freeze(JOB_TIME_MEAN)  # per job type and routing step, unit: second
+    job_generate_probability: tuple = tuple(JOB_GENERATE_PROBABILITY)
+    due_date_factor: float = DUE_DATE_FACTOR
+
+    # timing
+    backend_cycle_time: float = BACKEND_CYCLE_TIME  # unit: second
+    total_backend_run_time: float = TOTAL_BACKEND_RUN_TIME  # unit: second
+
+    def __post_init__(self):
+        for item in fields(self):
+            object.__setattr__(self, item.name, _freeze(getattr(self, item.name)))
+        self.validate()
+
+    def validate(self):
+        if len(self.num_machines_workstation) != self.num_workstations:
+            raise ValueError(f'SCENARIO {self.name}: {len(self.num_machines_workstation)} machine counts '
+                             f'for {self.num_workstations} workstations')
+        if not (len(self.job_time_mean) == len(self.job_generate_probability) == self.num_job_types):
+            raise ValueError(f'SCENARIO {self.name}: job_routing, job_time_mean and job_generate_probability '
+                             f'need one entry per job type')
+        for i_type, routing in enumerate(self.job_routing):
+            if len(self.job_time_mean[i_type]) != len(routing):
+                raise ValueError(f'SCENARIO {self.name}: job type {i_type + 1} has {len(routing)} routing steps '
+                                 f'but {len(self.job_time_mean[i_type])} mean times')
+            if not all(1 <= i_ws <= self.num_workstations for i_ws in routing):
+                raise ValueError(f'SCENARIO {self.name}: job type {i_type + 1} routing {routing} '
+                                 f'not in workstations 1..{self.num_workstations}')
+        if not math.isclose(sum(self.job_generate_probability), 1.0):
+            raise ValueError(f'SCENARIO {self.name}: job_generate_probability does not sum to 1')
+
+    @property
+    def num_workstations(self):
+        return len(self.workstation_pos)
+
+    @property
+    def num_job_types(self):
+        return len(self.job_routing)
+
+    @functools.cached_property
+    def layout(self):
+        # station distance matrices, built once per scenario
+        return Layout(self.factory_pos, self.workstation_pos, self.robot_speed)
+
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data, base=None):
+        '''
+        :param data: scenario values by field name, missing ones are taken from base
+        :param base: Scenario, None for DEFAULT_SCENARIO
+        '''
+        if base is None:
+            base = DEFAULT_SCENARIO
+        unknown = set(data) - {item.name for item in fields(Scenario)}
+        if unknown:
+            raise ValueError(f'SCENARIO keys {sorted(unknown)} not recognized')
+        return replace(base, **data)
+
+
+DEFAULT_SCENARIO = Scenario()
+
+
+def load_scenario(path, base=None):
+    '''
+    Read a scenario file, the format follows the extension: .json / .toml / .yaml (.yml, needs PyYAML)
+    :return: Scenario, named after the file unless it sets a name
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    elif extension == '.toml':
+        import tomllib
+        with open(path, 'rb') as file:
+            data = tomllib.load(file)
+    elif extension in ('.yaml', '.yml'):
+        import yaml
+        with open(path, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file) or {}
+    else:
+        raise ValueError(f'SCENARIO file type {extension} not recognized')
+
+    data.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    return Scenario.from_dict(data, base)
+
+
+def save_scenario(scenario, path):
+    # JSON, readable by load_scenario
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(scenario.to_dict(), file, indent=2)
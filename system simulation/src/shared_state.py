@@ -0,0 +1,397 @@
+'''
+Shared-memory hand-over of the factory state, for a backend running in its own process
+-> GUI_BACKEND_MODE 'process' (main.py): the simulation never competes with pygame for the GIL
+-> one multiprocessing.shared_memory block with a fixed numpy layout (make_layout), given by the scenario:
+   header: frame counter, control flags GUI -> backend, static names and positions
+   ring of SHARED_RING_SIZE frames: robot positions, machine states, queue lengths, ... of one FactorySnapshot
+-> SharedStateWriter (backend process): a SnapshotBuffer writing every published snapshot into the next ring slot
+-> SharedStateReader (GUI process): maps the block zero-copy, latest rebuilds the FactorySnapshot of the newest frame
+-> every frame carries a sequence number, odd while it is written: a reader that raced the writer reads again
+'''
+from multiprocessing import shared_memory
+
+from global_def import *
+from snapshot import *
+
+
+def make_layout(scenario):
+    '''
+    :return: (header dtype, frame dtype)
+    '''
+    num_robots = scenario.num_robots
+    num_workstations = scenario.num_workstations
+    num_machines = sum(scenario.num_machines_workstation)
+    max_routing_len = max(len(routing) for routing in scenario.job_routing)
+    name = f'S{SHARED_NAME_SIZE}'  # device / job names, ASCII
+
+    header = np.dtype([
+        ('write_count', np.uint64),  # frames published so far
+        ('pause_requested', np.bool_),  # GUI -> backend
+        ('stop_requested', np.bool_),  # GUI -> backend
+        ('speed_requested', np.float64),  # GUI -> backend, nan: keep
+        ('achieved_ratio', np.float64),  # backend -> GUI
+        # static, written with the first frame
+        ('factory_name', name),
+        ('factory_pos', np.float64, 2),
+        ('workstation_name', name, num_workstations),
+        ('workstation_pos', np.float64, (num_workstations, 2)),
+        ('machine_name', name, num_machines),  # the machines of all workstations one after another
+        ('robot_name', name, num_robots),
+    ])
+
+    frame = np.dtype([
+        ('seq', np.uint64),  # 2 * frame number, odd while the frame is written
+        # factory
+        ('total_run_time', np.float64),
+        ('total_input_job', np.int64),
+        ('total_output_job', np.int64),
+        ('input_queue_len', np.int64),
+        ('lq', np.float64),
+        ('wq', np.float64),
+        ('l', np.float64),
+        ('w', np.float64),
+        ('total_alive_job', np.int64),
+        ('job_time_mean', np.float64),
+        # robots
+        ('robot_pos', np.float64, (num_robots, 2)),
+        ('robot_is_busy', np.bool_, num_robots),
+        ('robot_is_loaded', np.bool_, num_robots),
+        ('robot_distance_pct', np.float64, num_robots),
+        ('robot_job', name, num_robots),
+        ('robot_time_util', np.float64, num_robots),
+        ('robot_input_job', np.int64, num_robots),
+        ('robot_output_job', np.int64, num_robots),
+        # machines
+        ('machine_is_busy', np.bool_, num_machines),
+        ('machine_job', name, num_machines),
+        ('machine_progress', np.int32, num_machines),
+        # workstations
+        ('workstation_time_util', np.float64, num_workstations),
+        ('workstation_output_len', np.int64, num_workstations),
+        ('workstation_output_queue', name, (num_workstations, SHARED_QUEUE_CAPACITY)),  # first job names
+        ('workstation_total_output', np.int64, num_workstations),
+        ('workstation_queue_len', np.int64, num_workstations),
+        ('workstation_lq', np.float64, num_workstations),
+        ('workstation_wq', np.float64, num_workstations),
+        # first alive jobs (side panel)
+        ('num_jobs', np.int32),
+        ('job_name', name, MAX_JOB_TO_SHOW),
+        ('job_routing_index', np.int32, MAX_JOB_TO_SHOW),
+        ('job_routing', np.int32, (MAX_JOB_TO_SHOW, max_routing_len)),  # workstation numbers, 0: padding
+        ('job_state', np.int32, MAX_JOB_TO_SHOW),  # JobState value
+        ('job_station', name, MAX_JOB_TO_SHOW),
+    ])
+    return header, frame
+
+
+def get_shared_state_size(scenario, ring_size=SHARED_RING_SIZE):
+    header, frame = make_layout(scenario)
+    return header.itemsize + ring_size * frame.itemsize
+
+
+def map_shared_state(buffer, scenario, ring_size=SHARED_RING_SIZE):
+    '''
+    Numpy views on the shared block, no copy
+    :return: (0-d header array, frame array of ring_size)
+    '''
+    header_dtype, frame_dtype = make_layout(scenario)
+    header = np.ndarray((), dtype=header_dtype, buffer=buffer)
+    frames = np.ndarray((ring_size,), dtype=frame_dtype, buffer=buffer, offset=header_dtype.itemsize)
+    return header, frames
+
+
+def create_shared_state(scenario, ring_size=SHARED_RING_SIZE):
+    # owned by the GUI process: close() and unlink() it when done, the backend process attaches by name
+    shm = shared_memory.SharedMemory(create=True, size=get_shared_state_size(scenario, ring_size))
+    # control fields are set here once, the writer attaching later must not reset a request the GUI already made
+    header, frames = map_shared_state(shm.buf, scenario, ring_size)
+    header['pause_requested'] = False
+    header['stop_requested'] = False
+    header['speed_requested'] = math.nan
+    header['achieved_ratio'] = math.nan
+    del header, frames  # release the views, the caller may close the block
+    return shm
+
+
+def check_name_size(names):
+    # the S{SHARED_NAME_SIZE} fields would cut longer names silently
+    for name in names:
+        if len(name.encode('ascii')) > SHARED_NAME_SIZE:
+            raise ValueError(f'NAME {name} longer than SHARED_NAME_SIZE={SHARED_NAME_SIZE} not recognized')
+
+
+def _decode(name):
+    return name.decode('ascii')
+
+
+class SharedStateWriter(SnapshotBuffer):
+    """
+    SnapshotBuffer of the backend process, every published snapshot is written into the shared ring
+    -> the GUI reads the ring itself, the backend never waits for it
+    """
+
+    def __init__(self, name, scenario, rate=SNAPSHOT_RATE, ring_size=SHARED_RING_SIZE):
+        '''
+        :param name: SharedMemory.name of the block made by create_shared_state
+        '''
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.header, self.frames = map_shared_state(self.shm.buf, scenario, ring_size)
+        super().__init__(rate)
+        self.is_static_written = False
+
+        # job names only grow with the job index, the longest one is known up front
+        check_name_size([Job(None, scenario.max_job_num - 1).name])
+
+    def init_control(self):
+        # set once by create_shared_state, the GUI may already have requested a pause / stop / speed
+        pass
+
+    @property
+    def pause_requested(self):
+        return bool(self.header['pause_requested'])
+
+    @pause_requested.setter
+    def pause_requested(self, paused):
+        self.header['pause_requested'] = paused
+
+    @property
+    def stop_requested(self):
+        return bool(self.header['stop_requested'])
+
+    @stop_requested.setter
+    def stop_requested(self, stop):
+        self.header['stop_requested'] = stop
+
+    @property
+    def speed_requested(self):
+        speed_ratio = float(self.header['speed_requested'])
+        return None if math.isnan(speed_ratio) else speed_ratio
+
+    @speed_requested.setter
+    def speed_requested(self, speed_ratio):
+        self.header['speed_requested'] = math.nan if speed_ratio is None else speed_ratio
+
+    @property
+    def achieved_ratio(self):
+        return float(self.header['achieved_ratio'])
+
+    @achieved_ratio.setter
+    def achieved_ratio(self, ratio):
+        self.header['achieved_ratio'] = ratio
+
+    def write_static(self, snapshot):
+        # device names, the job stations are among them
+        devices = [snapshot, *snapshot.workstations, *snapshot.robots,
+                   *(machine for workstation in snapshot.workstations for machine in workstation.machines)]
+        check_name_size([device.name for device in devices])
+
+        header = self.header
+        header['factory_name'] = snapshot.name
+        header['factory_pos'] = snapshot.pos
+        header['workstation_name'] = [workstation.name for workstation in snapshot.workstations]
+        header['workstation_pos'] = [workstation.pos for workstation in snapshot.workstations]
+        header['machine_name'] = [machine.name for workstation in snapshot.workstations
+                                  for machine in workstation.machines]
+        header['robot_name'] = [robot.name for robot in snapshot.robots]
+        self.is_static_written = True
+
+    def publish(self, snapshot):
+        if not self.is_static_written:
+            self.write_static(snapshot)
+
+        count = int(self.header['write_count'])
+        frame = self.frames[count % len(self.frames)]  # structured scalar: a view into the ring
+        frame['seq'] = 2 * count + 1
+
+        frame['total_run_time'] = snapshot.total_run_time
+        frame['total_input_job'] = snapshot.total_input_job
+        frame['total_output_job'] = snapshot.total_output_job
+        frame['input_queue_len'] = snapshot.input_queue_len
+        frame['lq'] = snapshot.lq
+        frame['wq'] = snapshot.wq
+        frame['l'] = snapshot.l
+        frame['w'] = snapshot.w
+        frame['total_alive_job'] = snapshot.total_alive_job
+        frame['job_time_mean'] = snapshot.job_time_mean
+
+        robots = snapshot.robots
+        frame['robot_pos'] = [robot.pos for robot in robots]
+        frame['robot_is_busy'] = [robot.is_busy for robot in robots]
+        frame['robot_is_loaded'] = [robot.is_loaded for robot in robots]
+        frame['robot_distance_pct'] = [robot.distance_travelled_pct for robot in robots]
+        frame['robot_job'] = [robot.job_name for robot in robots]
+        frame['robot_time_util'] = [robot.time_utilization for robot in robots]
+        frame['robot_input_job'] = [robot.total_input_job for robot in robots]
+        frame['robot_output_job'] = [robot.total_output_job for robot in robots]
+
+        machines = [machine for workstation in snapshot.workstations for machine in workstation.machines]
+        frame['machine_is_busy'] = [machine.is_busy for machine in machines]
+        frame['machine_job'] = [machine.job_name for machine in machines]
+        frame['machine_progress'] = [machine.progress for machine in machines]
+
+        workstations = snapshot.workstations
+        frame['workstation_time_util'] = [workstation.time_utilization for workstation in workstations]
+        frame['workstation_output_len'] = [len(workstation.output_queue) for workstation in workstations]
+        output_queue = frame['workstation_output_queue']
+        output_queue[:] = b''
+        for i_workstation, workstation in enumerate(workstations):
+            job_names = workstation.output_queue[:SHARED_QUEUE_CAPACITY]
+            output_queue[i_workstation, :len(job_names)] = job_names
+        frame['workstation_total_output'] = [workstation.total_output_job for workstation in workstations]
+        frame['workstation_queue_len'] = [workstation.input_queue_len for workstation in workstations]
+        frame['workstation_lq'] = [workstation.lq for workstation in workstations]
+        frame['workstation_wq'] = [workstation.wq for workstation in workstations]
+
+        jobs = snapshot.alive_jobs
+        frame['num_jobs'] = len(jobs)
+        frame['job_routing'] = 0
+        for i_job, job in enumerate(jobs):
+            frame['job_name'][i_job] = job.name
+            frame['job_routing_index'][i_job] = job.routing_index
+            frame['job_routing'][i_job, :len(job.routing_list)] = job.routing_list
+            frame['job_state'][i_job] = job.state.value
+            frame['job_station'][i_job] = job.station_name
+
+        frame['seq'] = 2 * count + 2
+        self.header['write_count'] = count + 1
+        self.version = count + 1
+
+    def close(self):
+        del self.header, self.frames  # release the views before the mapping
+        self.shm.close()
+
+
+class SharedStateReader:
+    """
+    GUI side of the shared ring, same latest / version / achieved_ratio / request_* as a SnapshotBuffer
+    -> latest: FactorySnapshot of the newest complete frame, None before the first one
+    """
+
+    def __init__(self, shm, scenario, ring_size=SHARED_RING_SIZE):
+        '''
+        :param shm: SharedMemory from create_shared_state, still owned (closed / unlinked) by the caller
+        '''
+        self.shm = shm
+        self.header, self.frames = map_shared_state(self.shm.buf, scenario, ring_size)
+        self.num_machines_workstation = scenario.num_machines_workstation
+
+        self.static = None  # names / positions from the header, read with the first frame
+        self.snapshot_version = 0
+        self.snapshot = None
+
+    @property
+    def version(self):
+        return int(self.header['write_count'])
+
+    @property
+    def latest(self):
+        version = self.version
+        if version == self.snapshot_version:
+            return self.snapshot
+
+        for i_try in range(SHARED_READ_RETRIES):
+            frame = self.frames[(version - 1) % len(self.frames)]
+            seq = int(frame['seq'])
+            if seq == 2 * version:
+                snapshot = self.to_snapshot(frame)
+                if int(frame['seq']) == seq:  # not overwritten while it was read
+                    self.snapshot_version, self.snapshot = version, snapshot
+                    break
+            version = self.version
+        return self.snapshot
+
+    def request_pause(self, paused):
+        self.header['pause_requested'] = paused
+
+    def request_stop(self):
+        self.header['stop_requested'] = True
+
+    def request_speed(self, speed_ratio):
+        self.header['speed_requested'] = speed_ratio
+
+    @property
+    def achieved_ratio(self):
+        return float(self.header['achieved_ratio'])
+
+    def read_static(self):
+        header = self.header
+        workstation_names = [_decode(name) for name in header['workstation_name']]
+        machine_names = [_decode(name) for name in header['machine_name']]
+        self.static = dict(factory_name=_decode(header['factory_name'][()]),
+                           factory_pos=tuple(header['factory_pos'].tolist()),
+                           workstation_names=workstation_names,
+                           workstation_pos=[tuple(pos) for pos in header['workstation_pos'].tolist()],
+                           machine_names=machine_names,
+                           robot_names=[_decode(name) for name in header['robot_name']])
+
+    def to_snapshot(self, frame):
+        if self.static is None:
+            self.read_static()
+        static = self.static
+
+        robots = tuple(RobotSnapshot(name=name,
+                                     pos=tuple(pos),
+                                     is_busy=is_busy,
+                                     is_loaded=is_loaded,
+                                     distance_travelled_pct=distance_travelled_pct,
+                                     job_name=_decode(job_name),
+                                     time_utilization=time_utilization,
+                                     total_input_job=total_input_job,
+                                     total_output_job=total_output_job)
+                       for name, pos, is_busy, is_loaded, distance_travelled_pct, job_name, time_utilization,
+                       total_input_job, total_output_job
+                       in zip(static['robot_names'], frame['robot_pos'].tolist(), frame['robot_is_busy'].tolist(),
+                              frame['robot_is_loaded'].tolist(), frame['robot_distance_pct'].tolist(),
+                              frame['robot_job'], frame['robot_time_util'].tolist(),
+                              frame['robot_input_job'].tolist(), frame['robot_output_job'].tolist()))
+
+        machines = [MachineSnapshot(name, is_busy, _decode(job_name), progress)
+                    for name, is_busy, job_name, progress
+                    in zip(static['machine_names'], frame['machine_is_busy'].tolist(), frame['machine_job'],
+                           frame['machine_progress'].tolist())]
+
+        workstations = []
+        i_machine = 0
+        for i_workstation, num_machines in enumerate(self.num_machines_workstation):
+            output_len = int(frame['workstation_output_len'][i_workstation])
+            output_queue = tuple(_decode(name) for name in
+                                 frame['workstation_output_queue'][i_workstation, :min(output_len,
+                                                                                       SHARED_QUEUE_CAPACITY)])
+            if output_len > SHARED_QUEUE_CAPACITY:
+                output_queue += ('...',)
+            workstations.append(WorkstationSnapshot(name=static['workstation_names'][i_workstation],
+                                                    pos=static['workstation_pos'][i_workstation],
+                                                    machines=tuple(machines[i_machine:i_machine + num_machines]),
+                                                    time_utilization=float(frame['workstation_time_util'][i_workstation]),
+                                                    output_queue=output_queue,
+                                                    total_output_job=int(frame['workstation_total_output'][i_workstation]),
+                                                    input_queue_len=int(frame['workstation_queue_len'][i_workstation]),
+                                                    lq=float(frame['workstation_lq'][i_workstation]),
+                                                    wq=float(frame['workstation_wq'][i_workstation])))
+            i_machine += num_machines
+
+        alive_jobs = tuple(JobSnapshot(name=_decode(frame['job_name'][i_job]),
+                                       routing_index=int(frame['job_routing_index'][i_job]),
+                                       routing_list=tuple(i_ws for i_ws in frame['job_routing'][i_job].tolist() if i_ws),
+                                       state=JOB_STATES[frame['job_state'][i_job]],
+                                       station_name=_decode(frame['job_station'][i_job]))
+                           for i_job in range(int(frame['num_jobs'])))
+
+        return FactorySnapshot(name=static['factory_name'],
+                               pos=static['factory_pos'],
+                               total_run_time=float(frame['total_run_time']),
+                               total_input_job=int(frame['total_input_job']),
+                               total_output_job=int(frame['total_output_job']),
+                               input_queue_len=int(frame['input_queue_len']),
+                               lq=float(frame['lq']),
+                               wq=float(frame['wq']),
+                               l=float(frame['l']),
+                               w=float(frame['w']),
+                               workstations=tuple(workstations),
+                               robots=robots,
+                               total_alive_job=int(frame['total_alive_job']),
+                               job_time_mean=float(frame['job_time_mean']),
+                               alive_jobs=alive_jobs)
+
+    def close(self):
+        del self.header, self.frames  # release the views, the owner can close the mapping now
@@ -0,0 +1,99 @@
+'''
+Wall-clock pacing of the backend loop (main.py)
+-> the simulation itself stays deterministic: every update is still a fixed backend_cycle_time step,
+   the clock only decides how long to wait between the steps
+-> speed ratio: simulated seconds per wall second, math.inf runs the steps back to back (max speed)
+-> every step has a due wall time on a schedule (anchor + simulated time / speed ratio), the clock sleeps only
+   what is left until it, so the cost of Factory.update() does not slow the simulation down
+-> the speed can change at any time (GUI keys), the schedule restarts from the current step
+-> achieved_ratio: the speed really reached over the last SIM_CLOCK_WINDOW wall seconds
+'''
+from collections import deque
+
+from global_def import *
+
+
+class SimClock:
+    """
+    Call tick() after every backend update
+    -> behind schedule by more than max_lag (slow steps, a debugger stop): the schedule restarts from now,
+       the simulation does not race to catch up
+    -> simulated time did not move (paused): sleep SIM_CLOCK_IDLE_TIME, the schedule restarts on resume
+    """
+
+    def __init__(self, speed_ratio=BACKEND_SPEED_RATIO, max_lag=SIM_CLOCK_MAX_LAG, window=SIM_CLOCK_WINDOW):
+        '''
+        :param speed_ratio: simulated seconds per wall second, math.inf: max speed
+        :param max_lag: unit: wall second
+        :param window: wall time the achieved ratio is measured over, unit: second
+        '''
+        self.speed_ratio = None
+        self.set_speed(speed_ratio)
+        self.max_lag = max_lag
+        self.window = window
+
+        self.anchor = None  # (wall time, simulated time) the schedule starts from, None: at the next tick
+        self.last_sim_time = None
+        self.samples = deque()  # (wall time, simulated time) of the ticks in the window
+        self.total_sleep_time = 0.0  # unit: wall second
+
+    @property
+    def is_max_speed(self):
+        return math.isinf(self.speed_ratio)
+
+    def set_speed(self, speed_ratio):
+        '''
+        :param speed_ratio: new target, None: keep the current one
+        '''
+        if speed_ratio is None or speed_ratio == self.speed_ratio:
+            return
+        if not speed_ratio > 0:
+            raise ValueError(f'SPEED RATIO {speed_ratio} not recognized')
+        self.speed_ratio = speed_ratio
+        self.anchor = None
+
+    def tick(self, sim_time):
+        '''
+        Wait until sim_time is due
+        :param sim_time: simulated time after the update, unit: second
+        '''
+        now = time.perf_counter()
+        self.samples.append((now, sim_time))
+        while now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+        # nothing simulated (paused): do not spin, start a new schedule once it moves again
+        if self.last_sim_time is not None and sim_time <= self.last_sim_time:
+            self.anchor = None
+            time.sleep(SIM_CLOCK_IDLE_TIME)
+            return
+        self.last_sim_time = sim_time
+
+        if self.anchor is None:
+            self.anchor = (now, sim_time)
+            return
+        if self.is_max_speed:
+            return
+
+        anchor_wall_time, anchor_sim_time = self.anchor
+        delay = anchor_wall_time + (sim_time - anchor_sim_time) / self.speed_ratio - now
+        if delay > 0:
+            time.sleep(delay)
+            self.total_sleep_time += delay
+        elif -delay > self.max_lag:
+            self.anchor = (now, sim_time)
+
+    @property
+    def achieved_ratio(self):
+        # simulated seconds per wall second over the window, nan before two ticks
+        if len(self.samples) < 2:
+            return math.nan
+        (first_wall_time, first_sim_time), (last_wall_time, last_sim_time) = self.samples[0], self.samples[-1]
+        if last_wall_time <= first_wall_time:
+            return math.nan
+        return (last_sim_time - first_sim_time) / (last_wall_time - first_wall_time)
+
+
+def get_speed_text(speed_ratio):
+    # 'MAX' or the ratio without trailing zeros
+    return 'MAX' if math.isinf(speed_ratio) else f'{speed_ratio:g}'
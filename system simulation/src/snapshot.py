@@ -0,0 +1,315 @@
+'''
+Immutable state snapshots, the only thing the GUI draws
+-> the backend builds a FactorySnapshot with Factory.snapshot() and publishes it to a SnapshotBuffer,
+   at most SNAPSHOT_RATE times per second (wall clock)
+-> publishing is a single reference swap: the GUI thread always gets a complete, consistent frame
+   and never iterates the live devices / job lists while the backend changes them
+-> snapshots hold plain numbers, strings and tuples, no references back to the devices
+'''
+import functools
+from dataclasses import dataclass
+
+from global_def import *
+from job import *
+from render import *
+
+
+def seconds_to_hhmmss(seconds):
+    # Calculate hours, minutes, and seconds
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    seconds = seconds % 60
+    # Return in hh:mm:ss format
+    return f'{int(hours):02}:{int(minutes):02}:{int(seconds):02}'
+
+
+@dataclass(frozen=True)
+class MachineSnapshot:
+    name: str
+    is_busy: bool
+    job_name: str = ''  # current job, '' when idle
+    progress: int = 0  # current job, unit: percent
+
+    def get_show_text(self):
+        if self.is_busy:
+            return f'**{self.name}** : [{self.job_name}] | {self.progress:2d}%', COLOR_GREEN
+        else:
+            return f'**{self.name}** : Idle', COLOR_YELLOW
+
+
+@dataclass(frozen=True)
+class WorkstationSnapshot:
+    name: str
+    pos: tuple  # unit: feet
+    machines: tuple  # MachineSnapshot per machine
+    time_utilization: float
+    output_queue: tuple  # names of the jobs waiting for a robot
+    total_output_job: int
+    input_queue_len: int
+    lq: float
+    wq: float  # unit: second
+
+    def draw(self, screen):
+
+        # Create text to be showed on screen
+        show_text_list = [(f'**{self.name}** ', COLOR_LIGHT_GREY)]
+
+        # Add machine info to the text
+        for machine in self.machines:
+            status_text, color = machine.get_show_text()
+            show_text_list.append((status_text, color))
+
+        # Display the mean busy ratio of the machines in this workstation
+        show_text_list.append((f'Time Util:{self.time_utilization * 100:3.0f}%', COLOR_LIGHT_BLUE))
+        show_text_list.append((f'Q_Out: {list(self.output_queue)}', COLOR_LIGHT_BLUE))
+        show_text_list.append((f'Output: {self.total_output_job}', COLOR_LIGHT_BLUE))
+        show_text_list.append((f'Queue: {self.input_queue_len}', COLOR_LIGHT_BLUE))
+        show_text_list.append((f'LQ: {self.lq:.2f} WQ: {self.wq:.0f}s', COLOR_LIGHT_BLUE))
+
+        # Draw the text box at the designated position
+        box_pos = map_to_screen(self.pos)
+        if self.pos[1] > 0:  # For top workstations, bottom center aligned
+            draw_text_box(screen, show_text_list, box_pos, top_center=False, align_center=False)
+        else:  # For lower workstations, top center aligned
+            draw_text_box(screen, show_text_list, box_pos, top_center=True, align_center=False)
+
+
+@dataclass(frozen=True)
+class RobotSnapshot:
+    name: str
+    pos: tuple  # unit: feet
+    is_busy: bool
+    is_loaded: bool
+    distance_travelled_pct: float  # current trip, unit: percent
+    job_name: str  # current job, '' when idle
+    time_utilization: float
+    total_input_job: int
+    total_output_job: int
+
+    def draw(self, screen):
+        import pygame  # GUI only, keep the backend importable without a display
+
+        if self.is_busy:
+            if self.is_loaded:
+                color = COLOR_GREEN
+            else:
+                color = COLOR_WHITE
+        else:
+            color = COLOR_YELLOW
+        screen_pos = map_to_screen(self.pos)
+
+        # name and percentage
+        robot_mark_text = TEXT_CACHE.render(self.name)
+        percentage_text = f'{int(self.distance_travelled_pct)}%'
+        if self.job_name:
+            percentage_text += f'[{self.job_name}]'
+        percentage_surface = TEXT_CACHE.render(percentage_text)
+
+        def paint(surface):
+            pygame.draw.circle(surface, color, screen_pos, ROBOT_DIAMETER // 2)
+            surface.blit(robot_mark_text, (screen_pos[0] - 8, screen_pos[1] - 8))
+            surface.blit(percentage_surface, (screen_pos[0] - 15, screen_pos[1] - 35))
+
+        radius = ROBOT_DIAMETER // 2
+        rect = pygame.Rect(screen_pos[0] - radius, screen_pos[1] - radius, 2 * radius + 1, 2 * radius + 1).unionall([
+            robot_mark_text.get_rect(topleft=(screen_pos[0] - 8, screen_pos[1] - 8)),
+            percentage_surface.get_rect(topleft=(screen_pos[0] - 15, screen_pos[1] - 35))])
+        draw_item(screen, ('robot', self.name), (screen_pos, color, percentage_text), rect, paint)
+
+
+@dataclass(frozen=True)
+class JobSnapshot:
+    name: str
+    routing_index: int
+    routing_list: tuple
+    state: JobState
+    station_name: str  # current workstation (or the factory entry)
+
+
+@dataclass(frozen=True)
+class FactorySnapshot:
+    """
+    One frame of the factory
+    -> built by Factory.snapshot() in the backend thread, drawn by the GUI thread
+    -> only the first MAX_JOB_TO_SHOW alive jobs are kept, that is all the side panel shows
+    """
+    name: str
+    pos: tuple  # entry position, unit: feet
+    total_run_time: float  # unit: second
+    total_input_job: int
+    total_output_job: int
+    input_queue_len: int
+    lq: float
+    wq: float  # unit: second
+    l: float
+    w: float  # unit: second
+    workstations: tuple  # WorkstationSnapshot per workstation
+    robots: tuple  # RobotSnapshot per robot
+    total_alive_job: int
+    job_time_mean: float  # mean total time of the finished jobs, unit: second
+    alive_jobs: tuple  # JobSnapshot of the first alive jobs
+
+    def draw(self, screen):
+        '''
+        Entry box, workstations, robots and the job / robot side panels
+        :param screen: pygame surface or Scene
+        '''
+
+        '''Factory State'''
+        # Create text to be showed on screen
+        show_text_list = [
+            (f'**{self.name}**', COLOR_LIGHT_GREY),
+            (f'Time: {seconds_to_hhmmss(self.total_run_time)}', COLOR_LIGHT_BLUE),
+            (f'Out: {self.total_output_job}', COLOR_LIGHT_BLUE),
+            (f'Out: {self.total_output_job / self.total_run_time * 3600:.1f} /h', COLOR_LIGHT_BLUE),
+            (f'In: {self.total_input_job}', COLOR_LIGHT_BLUE),
+            (f'In: {self.total_input_job / self.total_run_time * 3600:.1f} /h', COLOR_LIGHT_BLUE),
+            (f'(In-Out): {self.total_input_job - self.total_output_job}', COLOR_LIGHT_BLUE),
+            (f'Queue: {int(self.input_queue_len)}', COLOR_LIGHT_BLUE),
+            (f'LQ: {self.lq:.2f}', COLOR_LIGHT_BLUE),
+            (f'WQ: {self.wq:.0f} s', COLOR_LIGHT_BLUE),
+            (f'L: {self.l:.2f}', COLOR_LIGHT_BLUE),
+            (f'W: {self.w:.0f} s', COLOR_LIGHT_BLUE),
+        ]
+
+        # Draw the text box at the designated position, top center aligned
+        # 如果是 Entry 工厂，使用专门的绘制大框方法
+        if self.name == 'Entry':
+            box_pos = map_to_screen((self.pos[0]-100, self.pos[1]+500))
+            self.draw_entry_box(screen, show_text_list, box_pos, max_width=200, max_height=600)
+        else:
+            # 对于其他工厂，使用通用的绘制方法
+            box_pos = map_to_screen((self.pos[0], self.pos[1]))
+            draw_text_box(screen, show_text_list, box_pos, top_center=True, align_center=False, max_width=300)  # 默认大小
+        for workstation in self.workstations:
+            workstation.draw(screen)
+
+        for robot in self.robots:
+            robot.draw(screen)
+
+        '''Job State'''
+        # Show job status on the side:
+        box_pos = map_to_screen((self.pos[0] + WORLD_WIDTH * 0.5 + 370,
+                                 self.pos[1] + WORLD_HEIGHT))
+        side_text = []
+        side_text.append((f'Total alive jobs: {self.total_alive_job}', COLOR_LIGHT_GREY))
+        side_text.append((f'> Job Total Time (mean): {self.job_time_mean:.1f} s', COLOR_LIGHT_GREY))
+
+        for temp_job in self.alive_jobs:
+            temp_text = f'{temp_job.name}|'
+            temp_text += f'idx {temp_job.routing_index}|'
+            temp_text += f'{temp_job.routing_list}|'
+            temp_text += f'{temp_job.state}'[9:]
+            temp_text += f' @ {temp_job.station_name}'
+            side_text.append((temp_text, COLOR_LIGHT_BLUE))
+        draw_text_box(screen, side_text, box_pos,
+                      top_center=True, align_center=False, show_box=False,
+                      max_width=420)
+
+        '''Robot State'''
+        # Show robot status on the side:
+        box_pos = map_to_screen((self.pos[0] + WORLD_WIDTH * 0.5 + 370,
+                                 self.pos[1] + WORLD_HEIGHT - 450))
+        side_text = []
+        total_busy_robot = sum([robot.is_busy for robot in self.robots])
+        mean_robot_util = np.mean([robot.time_utilization for robot in self.robots])
+        side_text.append((f'Total Busy Robots: {total_busy_robot}', COLOR_LIGHT_GREY))
+        side_text.append((f'> Robot Time Util (mean): {mean_robot_util * 100:3.0f}%', COLOR_LIGHT_GREY))
+
+        for temp_robot in self.robots[:MAX_ROBOT_TO_SHOW]:
+            temp_text = f'{temp_robot.name}|'
+            temp_text += f'Time Util: {temp_robot.time_utilization * 100:3.0f}%|'
+            temp_text += f'In: {temp_robot.total_input_job}|'
+            temp_text += f'Out: {temp_robot.total_output_job}|'
+            temp_text += 'Busy' if temp_robot.is_busy else 'Idle'
+            side_text.append((temp_text, COLOR_LIGHT_BLUE))
+
+        draw_text_box(screen, side_text, box_pos,
+                      top_center=True, align_center=False, show_box=False,
+                      max_width=420)
+
+    def draw_entry_box(self, screen, show_text_list, position, max_width=400, max_height=600):
+        """
+        为 'Entry' 工厂画一个专门的大框
+        """
+        import pygame  # GUI only, keep the backend importable without a display
+        line_height = 70  # 行高
+        padding = 5
+        total_height = len(show_text_list) * line_height + padding  # 计算总高度
+        # 如果设置了最大高度，并且总高度超过了最大高度，则设置为最大高度
+        if total_height > max_height:
+            total_height = max_height
+
+        box_x = position[0] - max_width // 2
+        box_y = position[1] + 30  # Adjust position for better visibility
+
+        # 绘制大框和边框 (static layer)
+        border_rect = pygame.Rect(box_x - 5, box_y - 5, max_width + 10, total_height + 10)
+        draw_item(screen, ('border', self.name), None, border_rect, functools.partial(paint_border, border_rect),
+                  static=True)
+
+        # 绘制文本内容
+        for i, (text, bg_color) in enumerate(show_text_list):
+            line_rect = pygame.Rect(box_x, box_y + i * line_height, max_width, line_height)
+
+            # all words regular, the whole line comes from the cache unless its text changed
+            line_surface = TEXT_CACHE.render_line(text, markup=False)
+            paint_rect = line_rect.union(pygame.Rect(line_rect.left + 10, line_rect.top,
+                                                     line_surface.get_width(), line_height))
+            draw_item(screen, ('line', self.name, i), (text, bg_color), paint_rect,
+                      functools.partial(paint_text_line, line_rect, bg_color, line_surface))
+
+
+class SnapshotBuffer:
+    """
+    Hand-over of FactorySnapshots from the backend thread to the GUI thread
+    -> publish(): the backend swaps in a new snapshot, no lock, the GUI keeps drawing the one it already holds
+    -> publish_from(): build and publish only if 1 / rate seconds (wall clock) passed since the last one,
+       so a fast backend does not spend its time on snapshots nobody can see
+    -> latest / version: the GUI reads the newest snapshot, and redraws only if the version changed
+    -> request_pause() / request_stop() / request_speed(): the only way back, the backend applies them
+       before its next update and reports the speed it reached in achieved_ratio
+    """
+
+    def __init__(self, rate=SNAPSHOT_RATE):
+        self.min_interval = 1 / rate if rate else 0.0  # unit: second, 0: every call
+        self.latest = None  # newest FactorySnapshot, swapped as a whole
+        self.version = 0  # number of published snapshots
+        self.last_publish_time = -math.inf  # time.perf_counter()
+        self.init_control()
+
+    def init_control(self):
+        # GUI -> backend
+        self.pause_requested = False
+        self.stop_requested = False
+        self.speed_requested = None  # SimClock speed ratio, None: keep
+
+        # backend -> GUI
+        self.achieved_ratio = math.nan  # simulated seconds per wall second, measured by the SimClock
+
+    def request_pause(self, paused):
+        self.pause_requested = paused
+
+    def request_stop(self):
+        self.stop_requested = True
+
+    def request_speed(self, speed_ratio):
+        self.speed_requested = speed_ratio
+
+    def publish(self, snapshot):
+        # one attribute store: readers see either the old or the new snapshot, never a mix
+        self.latest = snapshot
+        self.version += 1
+
+    def publish_from(self, factory, force=False):
+        '''
+        :param factory: Factory to snapshot, called from the thread that updates it
+        :param force: publish even if the last snapshot is more recent than 1 / rate (e.g. the final state)
+        :return: True if a snapshot was published
+        '''
+        now = time.perf_counter()
+        if not force and now - self.last_publish_time < self.min_interval:
+            return False
+        self.last_publish_time = now
+        self.publish(factory.snapshot())
+        return True
@@ -0,0 +1,202 @@
+from global_def import *
+from array import array
+import json
+import zipfile
+
+
+# Column layout of the binary trace (one array per field)
+TRACE_COLUMNS = {
+    'queue': [('time', 'd'), ('workstation', 'i'), ('input_len', 'i'), ('output_len', 'i')],
+    'machine': [('time', 'd'), ('workstation', 'i'), ('index', 'i'), ('busy', 'b')],
+    'robot': [('time', 'd'), ('index', 'i'), ('state', 'b'), ('loaded', 'b')],
+}
+
+
+class TraceWriter:
+    """
+    Buffered trace owned by the Factory
+    -> samples are kept in typed arrays and written in bulk
+    -> mode 'change': one queue sample whenever a workstation queue length changes
+       mode 'period': at most one queue sample per workstation every `period` seconds
+    -> output by file suffix:
+       '.npz': columnar binary, covers queue lengths, machine busy flags and robot states; every full buffer
+               is appended as one chunk per field ('queue_time_00000', 'machine_busy_00003', ...), the run
+               metadata is JSON in 'meta'; read it with load_trace()
+       other:  headerless CSV lines 'Time,Workstation,QueueLength,OutputLength', written whenever the buffer is full
+    """
+
+    def __init__(self, path, mode=TRACE_MODE, period=TRACE_PERIOD, buffer_size=TRACE_BUFFER_SIZE, metadata=None):
+        if mode not in ('change', 'period'):
+            raise ValueError(f'TRACE_MODE {mode} not recognized')
+
+        self.path = path
+        self.mode = mode
+        self.period = period
+        self.buffer_size = buffer_size
+        self.metadata = dict(metadata or {})
+        self.is_columnar = path.endswith('.npz')
+
+        # sample buffers, one typed array per column
+        self.columns = {channel: {name: array(type_code) for name, type_code in fields}
+                        for channel, fields in TRACE_COLUMNS.items()}
+
+        self.last_queue_len = {}  # workstation index -> last sampled (input_len, output_len)
+        self.last_sample_time = {}  # workstation index -> last sample time
+
+        self.total_samples = 0
+        self.num_chunks = 0  # columnar chunks written
+        self.is_file_started = False  # the first flush truncates the file of a previous run
+
+    def append(self, channel, *values):
+        columns = self.columns[channel]
+        for column, value in zip(columns.values(), values):
+            column.append(value)
+        self.total_samples += 1
+
+        # bounded memory: write the channel buffers out in bulk once one of them is full
+        if len(columns['time']) >= self.buffer_size:
+            self.flush()
+
+    def record_queue(self, now, workstation_index, input_len, output_len=0):
+        if self.mode == 'change':
+            if self.last_queue_len.get(workstation_index) == (input_len, output_len):
+                return
+        elif now - self.last_sample_time.get(workstation_index, -self.period) < self.period - EPS:
+            return
+
+        self.last_queue_len[workstation_index] = (input_len, output_len)
+        self.last_sample_time[workstation_index] = now
+
+        self.append('queue', now, workstation_index, input_len, output_len)
+
+    def record_machine(self, now, workstation_index, machine_index, busy):
+        if self.is_columnar:
+            self.append('machine', now, workstation_index, machine_index, busy)
+
+    def record_robot(self, now, robot_index, state, loaded):
+        if self.is_columnar:
+            self.append('robot', now, robot_index, state, loaded)
+
+    def flush(self):
+        if self.is_columnar:
+            self.write_columnar()
+            return
+
+        queue = self.columns['queue']
+        if not self.is_file_started:
+            file_mode = 'w'
+            self.is_file_started = True
+        elif len(queue['time']) == 0:
+            return
+        else:
+            file_mode = 'a'
+
+        with open(self.path, file_mode) as f:
+            f.writelines(f'{t},{ws},{q},{q_out}\n' for t, ws, q, q_out in zip(queue['time'], queue['workstation'],
+                                                                          queue['input_len'], queue['output_len']))
+
+        for column in queue.values():
+            del column[:]
+
+    def write_columnar(self):
+        # the .npz is a zip of .npy entries: add one entry per buffered column, uncompressed so that
+        # np.load() reads only the entries that are accessed
+        if not self.is_file_started:
+            file_mode = 'w'
+            self.is_file_started = True
+        elif all(len(fields['time']) == 0 for fields in self.columns.values()):
+            return
+        else:
+            file_mode = 'a'
+
+        with zipfile.ZipFile(self.path, file_mode, compression=zipfile.ZIP_STORED, allowZip64=True) as file:
+            if file_mode == 'w':
+                self.write_entry(file, 'meta', np.array(json.dumps(self.metadata)))
+            for channel, fields in self.columns.items():
+                if len(fields['time']) == 0:
+                    continue
+                for name, column in fields.items():
+                    self.write_entry(file, f'{channel}_{name}_{self.num_chunks:05d}',
+                                     np.frombuffer(column, dtype=column.typecode))
+                    del column[:]
+        self.num_chunks += 1
+
+    @staticmethod
+    def write_entry(file, key, values):
+        with file.open(f'{key}.npy', 'w', force_zip64=True) as entry:
+            np.lib.format.write_array(entry, values, allow_pickle=False)
+
+    def close(self):
+        self.flush()
+
+
+class TraceFile:
+    """
+    Lazy reader of a '.npz' trace, returned by load_trace()
+    -> trace['queue_time'] reads the chunks of one field only and concatenates them
+    -> metadata: the run metadata
+    -> context manager, close() releases the file
+    """
+
+    def __init__(self, path):
+        self.npz = np.load(path)
+        self.metadata = json.loads(str(self.npz['meta']))
+
+        # field -> chunk keys in writing order (files written in one piece have no chunk number)
+        self.chunk_keys = {}
+        for key in sorted(self.npz.files):
+            field, _, chunk = key.rpartition('_')
+            if not chunk.isdigit():
+                field = key
+            self.chunk_keys.setdefault(field, []).append(key)
+
+    def __getitem__(self, field):
+        channel, _, name = field.partition('_')
+        type_code = dict(TRACE_COLUMNS[channel])[name]
+        chunks = [self.npz[key] for key in self.chunk_keys.get(field, [])]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=type_code)
+
+    def close(self):
+        self.npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_trace(path):
+    '''
+    Open a '.npz' trace lazily
+    :return: TraceFile, use it in a with statement; trace['queue_time'] etc. are only read when accessed
+    '''
+    return TraceFile(path)
+
+
+def read_queue_trace(path):
+    '''
+    Read only the queue columns of a trace ('.npz' or legacy CSV)
+    :return: dict workstation index -> (time, input_len) arrays sorted by time, metadata
+    '''
+    if path.endswith('.npz'):
+        with load_trace(path) as trace:
+            time_values = trace['queue_time']
+            workstation = trace['queue_workstation']
+            queue_len = trace['queue_input_len']
+            metadata = trace.metadata
+    else:
+        data = np.loadtxt(path, delimiter=',', ndmin=2)
+        time_values, workstation, queue_len = data[:, 0], data[:, 1].astype(int), data[:, 2]
+        metadata = {}
+
+    # group by workstation once instead of filtering the whole table per workstation
+    order = np.lexsort((time_values, workstation))
+    workstation = workstation[order]
+    split_index = np.flatnonzero(np.diff(workstation)) + 1
+    series = {}
+    for ws_index, ws_time, ws_queue in zip(np.split(workstation, split_index),
+                                           np.split(time_values[order], split_index),
+                                           np.split(queue_len[order], split_index)):
+        series[int(ws_index[0])] = (ws_time, ws_queue)
+    return series, metadata
@@ -1,6 +1,12 @@
+import os
+import sys
+
 import simpy
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from layout import DEFAULT_LAYOUT
+
 # Global parameters
 NUM_WORKSTATIONS = 5
 FORKLIFT_SPEED = 5   # feet per second
@@ -13,18 +19,9 @@ JOB_TYPES = {
     2: {'operations': [4, 1, 3], 'mean_service_times': [0.15 * 3600, 0.20 * 3600, 0.30 * 3600]},
     3: {'operations': [2, 5, 1, 4, 3], 'mean_service_times': [0.15 * 3600, 0.10 * 3600, 0.35 * 3600, 0.20 * 3600, 0.20 * 3600]}
 }
-# Distance matrix between stations (in feet)
-# Station 1 is at index 0, Station 2 at index 1, and so on.
-distances = {
-    (1, 2): 150, (1, 3): 213, (1, 4): 336, (1, 5): 300, (1, 6): 150,
-    (2, 3): 150, (2, 4): 300, (2, 5): 336, (2, 6): 213,
-    (3, 4): 150, (3, 5): 213, (3, 6): 150,
-    (4, 5): 150, (4, 6): 213,
-    (5, 6): 150
-}
-# Add the reverse distances (symmetrical matrix)
-for (i, j), dist in list(distances.items()):
-    distances[(j, i)] = dist
+# Distance matrix between stations (in feet), from the shared layout model (src/layout.py)
+# Station 1 is at index 1, Station 2 at index 2, and so on.
+distances = DEFAULT_LAYOUT.get_station_distances(first_index=1)
 
 class ManufacturingSystem:
     def __init__(self, env, workstation_machines, num_forklifts = 3):  #num_forklifts=3
@@ -1,8 +1,14 @@
+import os
+import sys
+
 import job
 from machine import *
 from workstation import *
 import random
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from arrivals import ArrivalCursor
+
 
 class Hub(WorkStation):
     def __init__(self, station_id, job_types, thoughtput_goal, job_arrival_rate):
@@ -11,6 +17,7 @@ class Hub(WorkStation):
         self.thoughtput_goal = thoughtput_goal
         self.job_arrival_rate = job_arrival_rate
         self.job_initialize_list = [] # 初始化列表，在开始的时候生成随机数
+        self.arrival_cursor = ArrivalCursor([])  # 按到达时间依次取出 job_initialize_list 中的任务
         self.total_jobs = 0 
         
 
@@ -48,14 +55,16 @@ class Hub(WorkStation):
             
             # 更新已生成的任务数
             self.total_jobs += 1
+
+        self.arrival_cursor = ArrivalCursor([tmp_job.start_time for tmp_job in self.job_initialize_list], tolerance=0)
         
 
     def update_hub(self, time):
-        # 根据已经生成的随机数，每过一秒，在output队列里面添加任务
-        for tmp_job in self.job_initialize_list:
-            if tmp_job.start_time == time:
-                tmp_job.status = Job_Status.Waiting
-                self.output_queue.append(tmp_job)
+        # 根据已经生成的随机数，每过一秒，在output队列里面添加到达的任务
+        for i_job in self.arrival_cursor.pop_due(time):
+            tmp_job = self.job_initialize_list[i_job]
+            tmp_job.status = Job_Status.Waiting
+            self.output_queue.append(tmp_job)
         print(f'update_hub, hub_output_queue: {self.output_queue}')
 
 